@@ -0,0 +1,59 @@
+import gzip
+import zlib
+from functools import wraps
+from typing import Callable
+
+from flask import Response, jsonify, request
+
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+
+
+def conditional(etag_for: Callable[[str], str]):
+    """Answer a cluster view with 304 when the client already holds its current ETag
+
+    The wrapped view returns a result dict; successful results are sent with a weak
+    ETag computed before the view runs, so a write during the request is never hidden.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(name, *args, **kwargs):
+            etag = etag_for(name)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            result = view(name, *args, **kwargs)
+            response = jsonify(result)
+            if result.get('success'):
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def compress_response(response: Response) -> Response:
+    """Compress large responses with gzip or deflate when the client accepts it"""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200 or 'Content-Encoding' in response.headers):
+        return response
+
+    accepted = request.accept_encodings
+    if accepted['gzip']:
+        encoding, compress = 'gzip', lambda data: gzip.compress(data, COMPRESS_LEVEL)
+    elif accepted['deflate']:
+        encoding, compress = 'deflate', lambda data: zlib.compress(data, COMPRESS_LEVEL)
+    else:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(compress(data))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -1,8 +1,25 @@
 from flask import Blueprint, jsonify, request
-from core.vault_client import VaultManager
+from core.vault_client import VaultManager, CONNECT_TIMEOUT, TREE_OP_RATE
+from core.state_store import open_store
+from core.profiler import SharedProfiler, PROFILE_DURATION, PROFILE_MAX_DURATION
+from core.tracing import tracer
+from api.http_cache import compress_response, conditional
 
 api_bp = Blueprint('api', __name__)
-vault_manager = VaultManager()
+vault_manager = VaultManager(store=open_store())
+api_bp.before_request(vault_manager.refresh_registry)
+api_bp.after_request(compress_response)
+profiler = SharedProfiler(vault_manager.store)
+tracer.share(vault_manager.store)
+
+
+def number_arg(value, kind=float, minimum=0):
+    """value converted with kind when it is at least minimum, otherwise None"""
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number >= minimum else None
 
 # ============ Cluster Management ============
 
@@ -22,7 +39,8 @@ def add_cluster():
         name=data['name'],
         url=data['url'],
         token=data['token'],
-        description=data.get('description', '')
+        description=data.get('description', ''),
+        timeout=data.get('timeout', CONNECT_TIMEOUT)
     )
     return jsonify(result)
 
@@ -51,21 +69,27 @@ def cluster_status(name):
     result = vault_manager.get_cluster_status(name)
     return jsonify(result)
 
+@api_bp.route('/clusters/<name>/overview', methods=['GET'])
+def cluster_overview(name):
+    """Get status, mount points and the first level of the secrets tree"""
+    result = vault_manager.get_cluster_overview(name)
+    return jsonify(result)
+
 # ============ Secrets Management ============
 
 @api_bp.route('/clusters/<name>/secrets', methods=['GET'])
+@conditional(vault_manager.catalog_etag)
 def list_secrets(name):
     """List all secrets in a cluster"""
     mount_point = request.args.get('mount_point', None)
     path = request.args.get('path', '')
-    result = vault_manager.list_secrets(name, mount_point, path)
-    return jsonify(result)
+    return vault_manager.list_secrets(name, mount_point, path)
 
 @api_bp.route('/clusters/<name>/secrets/tree', methods=['GET'])
+@conditional(vault_manager.catalog_etag)
 def secrets_tree(name):
     """Get secrets as a tree structure"""
-    result = vault_manager.get_secrets_tree(name)
-    return jsonify(result)
+    return vault_manager.get_secrets_tree(name)
 
 @api_bp.route('/clusters/<name>/secret', methods=['GET'])
 def read_secret(name):
@@ -86,6 +110,24 @@ def create_secret(name):
     result = vault_manager.write_secret(name, data['mount_point'], data['path'], data['data'])
     return jsonify(result)
 
+@api_bp.route('/clusters/<name>/secrets/batch/read', methods=['POST'])
+def read_secrets_batch(name):
+    """Read several secrets in one request"""
+    data = request.json
+    if not data or not isinstance(data.get('items'), list):
+        return jsonify({'success': False, 'message': 'items must be a list of paths or {mount_point, path}'}), 400
+    result = vault_manager.read_secrets_batch(name, data['items'])
+    return jsonify(result)
+
+@api_bp.route('/clusters/<name>/secrets/batch/write', methods=['POST'])
+def write_secrets_batch(name):
+    """Create or update several secrets in one request"""
+    data = request.json
+    if not data or not isinstance(data.get('items'), list):
+        return jsonify({'success': False, 'message': 'items must be a list of {mount_point, path, data}'}), 400
+    result = vault_manager.write_secrets_batch(name, data['items'])
+    return jsonify(result)
+
 @api_bp.route('/clusters/<name>/secret', methods=['DELETE'])
 def delete_secret(name):
     """Delete a secret"""
@@ -96,6 +138,50 @@ def delete_secret(name):
     result = vault_manager.delete_secret(name, mount_point, path)
     return jsonify(result)
 
+@api_bp.route('/clusters/<name>/tree/delete', methods=['POST'])
+def delete_tree(name):
+    """Delete a secret or every secret below a folder"""
+    data = request.json
+    if not data or 'path' not in data:
+        return jsonify({'success': False, 'message': 'path is required'}), 400
+    rate = number_arg(data.get('rate', TREE_OP_RATE))
+    if rate is None:
+        return jsonify({'success': False, 'message': 'rate must be a number >= 0'}), 400
+    result = vault_manager.delete_tree(
+        name, data['path'],
+        dry_run=data.get('dry_run', False),
+        rate=rate
+    )
+    return jsonify(result)
+
+@api_bp.route('/clusters/<name>/tree/move', methods=['POST'])
+def move_tree(name):
+    """Move or rename a secret or a whole folder"""
+    data = request.json
+    if not data or not all(k in data for k in ['source_path', 'target_path']):
+        return jsonify({'success': False, 'message': 'Missing required fields: source_path, target_path'}), 400
+    rate = number_arg(data.get('rate', TREE_OP_RATE))
+    if rate is None:
+        return jsonify({'success': False, 'message': 'rate must be a number >= 0'}), 400
+    result = vault_manager.move_tree(
+        name, data['source_path'], data['target_path'],
+        dry_run=data.get('dry_run', False),
+        rate=rate
+    )
+    return jsonify(result)
+
+# ============ Jobs ============
+
+@api_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List background jobs"""
+    return jsonify(vault_manager.list_jobs())
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get progress of a background job"""
+    return jsonify(vault_manager.get_job(job_id))
+
 # ============ Mount Points ============
 
 @api_bp.route('/clusters/<name>/mounts', methods=['GET'])
@@ -163,6 +249,62 @@ def save_config():
 
 @api_bp.route('/config/load', methods=['POST'])
 def load_config():
-    """Load configuration from file"""
+    """Reconcile the cluster registry with the configuration file, the file wins"""
     result = vault_manager.load_config()
-    return jsonify(result)
\ No newline at end of file
+    return jsonify(result)
+
+# ============ Profiling ============
+
+@api_bp.route('/profile', methods=['GET'])
+def get_profile():
+    """The running or last finished profile"""
+    return jsonify({'success': True, 'profile': profiler.status()})
+
+@api_bp.route('/profile/start', methods=['POST'])
+def start_profile():
+    """Start sampling the worker serving this request, for at most duration seconds"""
+    data = request.json or {}
+    interval = number_arg(data.get('interval', 0.005))
+    top = number_arg(data.get('top', 25), int, 1)
+    duration = number_arg(data.get('duration', PROFILE_DURATION))
+    if not interval or interval > 1:
+        return jsonify({'success': False, 'message': 'interval must be a number of seconds in (0, 1]'}), 400
+    if top is None:
+        return jsonify({'success': False, 'message': 'top must be an integer >= 1'}), 400
+    if not duration or duration > PROFILE_MAX_DURATION:
+        return jsonify({'success': False, 'message': f'duration must be a number of seconds in (0, {PROFILE_MAX_DURATION}]'}), 400
+    record = profiler.start(interval, top, duration)
+    if record is None:
+        return jsonify({'success': False, 'message': 'A profile is already running'})
+    return jsonify({'success': True, 'message': f'Profiling worker {record["pid"]} for {duration:g}s', 'profile': record})
+
+@api_bp.route('/profile/stop', methods=['POST'])
+def stop_profile():
+    """Stop the running profile, whichever worker runs it, and return its summary"""
+    data = request.json or {}
+    top = number_arg(data['top'], int, 1) if 'top' in data else None
+    if 'top' in data and top is None:
+        return jsonify({'success': False, 'message': 'top must be an integer >= 1'}), 400
+    record = profiler.stop(top)
+    if record is None:
+        return jsonify({'success': False, 'message': 'No profile is running'})
+    if not record.get('summary'):
+        return jsonify({'success': True, 'message': 'Stop requested, the summary is not written yet', 'profile': record})
+    return jsonify({'success': True, 'profile': record['summary']})
+
+# ============ Tracing ============
+
+@api_bp.route('/trace', methods=['GET'])
+def get_trace():
+    """Recorded spans as Chrome trace-event JSON"""
+    return jsonify(tracer.chrome_trace())
+
+@api_bp.route('/trace', methods=['POST'])
+def set_trace():
+    """Set the trace sample rate (0 turns tracing off) and optionally clear recorded spans"""
+    data = request.json or {}
+    sample = number_arg(data.get('sample', tracer.sample))
+    if sample is None or sample > 1:
+        return jsonify({'success': False, 'message': 'sample must be between 0 and 1'}), 400
+    tracer.configure(sample, bool(data.get('clear')))
+    return jsonify({'success': True, 'sample': tracer.sample})
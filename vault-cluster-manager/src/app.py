@@ -7,7 +7,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from flask import Flask, render_template
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from api.routes import api_bp
+from api.routes import api_bp, vault_manager
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
@@ -26,4 +26,9 @@ def health():
     return {'status': 'healthy'}
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5555, debug=True)
\ No newline at end of file
+    debug = True
+    # With the reloader only the child process serves requests, load clusters there
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Clusters connect concurrently, mounts and top-level listings warm up in the background
+        app.logger.info(vault_manager.load_config(seed_only=True).get('message'))
+    socketio.run(app, host='0.0.0.0', port=5555, debug=debug)
\ No newline at end of file
@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MAX_JOB_ERRORS = 50
+# Progress of running jobs reaches a shared store at most this often (seconds)
+STORE_INTERVAL = 0.5
+
+
+class JobRegistry:
+    """Thread-safe registry of background jobs and their progress
+    
+    With a shared state store, jobs are also written there so any worker can report them.
+    """
+    
+    def __init__(self, max_finished: int = 100, store=None):
+        self._jobs: Dict[str, Dict] = {}
+        self._stored: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.max_finished = max_finished
+        self.store = store
+    
+    def create(self, job_type: str, cluster: str, total: int) -> Dict:
+        """Register a new running job"""
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'type': job_type,
+            'cluster': cluster,
+            'status': 'running',
+            'total': total,
+            'done': 0,
+            'failed': 0,
+            'errors': [],
+            'message': '',
+            'started': datetime.now().isoformat(),
+            'finished': None
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._prune()
+            self._save(job, force=True)
+            return dict(job)
+    
+    def advance(self, job_id: str, error: Optional[Dict] = None):
+        """Count one processed item, optionally as failed"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job['done'] += 1
+            if error:
+                job['failed'] += 1
+                if len(job['errors']) < MAX_JOB_ERRORS:
+                    job['errors'].append(error)
+            self._save(job)
+    
+    def finish(self, job_id: str, message: str = ''):
+        """Mark a job as finished"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job['status'] = 'failed' if job['failed'] else 'finished'
+            job['message'] = message
+            job['finished'] = datetime.now().isoformat()
+            self._save(job, force=True)
+            self._stored.pop(job_id, None)
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job, errors=list(job['errors']))
+        # Started by another worker
+        return self.store.get_job(job_id) if self.store else None
+    
+    def list(self) -> List[Dict]:
+        """Snapshots of all known jobs, newest first"""
+        with self._lock:
+            jobs = {job['id']: dict(job, errors=list(job['errors'])) for job in self._jobs.values()}
+        if self.store:
+            for job in self.store.list_jobs():
+                jobs.setdefault(job['id'], job)
+        return sorted(jobs.values(), key=lambda j: j['started'], reverse=True)
+    
+    def _save(self, job: Dict, force: bool = False):
+        """Write a job to the shared store, throttled to STORE_INTERVAL while it runs"""
+        if not self.store:
+            return
+        now = time.monotonic()
+        if force or now - self._stored.get(job['id'], 0) >= STORE_INTERVAL:
+            self._stored[job['id']] = now
+            self.store.save_job(job)
+    
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished"""
+        finished = [j for j in self._jobs.values() if j['status'] != 'running']
+        for job in sorted(finished, key=lambda j: j['started'])[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job['id']]
+        if self.store:
+            self.store.prune_jobs(self.max_finished)
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads, rate 0 means no limit"""
+    
+    def __init__(self, rate: float = 0):
+        self.rate = rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until the caller may issue its next request"""
+        if not self.rate:
+            return
+        with self._lock:
+            slot = max(time.monotonic(), self._next)
+            self._next = slot + 1.0 / self.rate
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+# Only the standard library and requests are used, vault_tool.py loads this module for HA clusters too
+
+# Node roles by GET /v1/sys/health status code, anything else is unavailable
+NODE_ROLES = {200: 'active', 429: 'standby', 472: 'dr-secondary', 473: 'perfstandby'}
+HEALTH_INTERVAL = 10
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 30
+READ_METHODS = ('GET', 'HEAD', 'LIST')
+
+
+def split_urls(url: str) -> List[str]:
+    """Node URLs of a cluster given as one URL or a comma separated list"""
+    return [u.strip().rstrip('/') for u in url.split(',') if u.strip()]
+
+
+class Node:
+    """One Vault node with its role, smoothed latency and circuit breaker state"""
+    
+    def __init__(self, url: str):
+        self.url = url
+        self.role = 'unknown'
+        self.latency: Optional[float] = None
+        self.inflight = 0
+        self.failures = 0
+        self.open_until = 0.0
+        # Requests of many threads go through the same node
+        self._lock = threading.Lock()
+    
+    def begin(self):
+        """Count a request in flight"""
+        with self._lock:
+            self.inflight += 1
+    
+    def end(self):
+        with self._lock:
+            self.inflight -= 1
+    
+    def observe(self, elapsed: Optional[float]):
+        """Record a request, None for a failure
+        
+        BREAKER_FAILURES failures in a row eject the node for BREAKER_COOLDOWN seconds;
+        after that a single failure ejects it again until a request succeeds.
+        """
+        with self._lock:
+            if elapsed is None:
+                self.failures += 1
+                if self.failures >= BREAKER_FAILURES:
+                    self.open_until = time.monotonic() + BREAKER_COOLDOWN
+            else:
+                self.failures = 0
+                self.latency = elapsed if self.latency is None else 0.7 * self.latency + 0.3 * elapsed
+    
+    def to_dict(self) -> Dict:
+        return {
+            'url': self.url,
+            'role': self.role,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'failures': self.failures,
+            'ejected': self.open_until > time.monotonic()
+        }
+
+
+class NodeSession(requests.Session):
+    """Routes hvac requests over the nodes of an HA cluster
+    
+    hvac sends every request with the first node as base URL. Reads go to the performance
+    standby with the best latency (the active node when there is none), writes to the
+    active node, and reads failing on one node are repeated on the next. verify is the
+    session's TLS setting, hvac takes it over and the health checks use it too.
+    """
+    
+    def __init__(self, urls: List[str], verify=True):
+        super().__init__()
+        self.verify = verify
+        self.base = urls[0]
+        self.nodes = [Node(url) for url in urls]
+        self._checked = 0.0
+        self._lock = threading.Lock()
+    
+    def request(self, method, url, *args, **kwargs):
+        if not url.startswith(self.base):
+            return super().request(method, url, *args, **kwargs)
+        path = url[len(self.base):]
+        read = method.upper() in READ_METHODS
+        tried: List[Node] = []
+        while True:
+            node = self._pick(read, tried)
+            tried.append(node)
+            node.begin()
+            start = time.perf_counter()
+            try:
+                response = super().request(method, node.url + path, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                node.observe(None)
+                self._checked = 0.0
+                # A write may already have been applied, only reads are repeated
+                if read and len(tried) < len(self.nodes):
+                    continue
+                raise
+            finally:
+                node.end()
+            if response.status_code in (502, 503, 504):
+                node.observe(None)
+                self._checked = 0.0
+                if read and len(tried) < len(self.nodes):
+                    continue
+                return response
+            node.observe(time.perf_counter() - start)
+            return response
+    
+    def status(self) -> List[Dict]:
+        return [node.to_dict() for node in self.nodes]
+    
+    def _pick(self, read: bool, tried: List[Node]) -> Node:
+        self._refresh_health()
+        now = time.monotonic()
+        live = [n for n in self.nodes if n.open_until <= now and n not in tried]
+        if read:
+            # Plain standbys would only forward reads to the active node
+            pool = [n for n in live if n.role == 'perfstandby'] or [n for n in live if n.role == 'active']
+        else:
+            pool = [n for n in live if n.role == 'active']
+        # No node in the expected role: any live node, standbys forward to the active one
+        pool = pool or live or [n for n in self.nodes if n not in tried]
+        # Power of two choices on smoothed latency times requests in flight
+        first, second = random.sample(pool, 2) if len(pool) > 1 else (pool[0], pool[0])
+        return min(first, second, key=lambda n: (n.latency or 0) * (n.inflight + 1))
+    
+    def _refresh_health(self):
+        """Re-read node roles every HEALTH_INTERVAL, only the first request waits for it"""
+        if time.monotonic() - self._checked < HEALTH_INTERVAL:
+            return
+        if not self._lock.acquire(blocking=self._checked == 0):
+            return
+        try:
+            if time.monotonic() - self._checked >= HEALTH_INTERVAL:
+                with ThreadPoolExecutor(max_workers=len(self.nodes)) as executor:
+                    list(executor.map(self._check, self.nodes))
+                self._checked = time.monotonic()
+        finally:
+            self._lock.release()
+    
+    def _check(self, node: Node):
+        start = time.perf_counter()
+        try:
+            response = super().request('GET', f"{node.url}/v1/sys/health", verify=self.verify, timeout=5)
+        except requests.exceptions.RequestException:
+            node.role = 'unavailable'
+            node.observe(None)
+            return
+        node.role = NODE_ROLES.get(response.status_code, 'unavailable')
+        node.observe(None if node.role == 'unavailable' else time.perf_counter() - start)
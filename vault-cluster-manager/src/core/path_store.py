@@ -0,0 +1,182 @@
+import sys
+from typing import Dict, Iterator, List, Optional
+
+
+class _Node:
+    """Trie node, one per path segment"""
+
+    __slots__ = ('children', 'is_secret', 'count')
+
+    def __init__(self):
+        self.children: Optional[Dict[str, '_Node']] = None
+        self.is_secret = False
+        self.count = 0
+
+
+# Plain secrets (no folder of the same name) are stored as a None child instead of a node
+_LEAF = None
+
+
+class PathStore:
+    """Compact store of secret paths as a trie of interned path segments"""
+
+    def __init__(self, paths: Optional[List[str]] = None):
+        self._root = _Node()
+        for path in paths or ():
+            self.add(path)
+
+    def __len__(self) -> int:
+        return self._root.count
+
+    def __contains__(self, path: str) -> bool:
+        parts = path.strip('/').split('/')
+        parent = self._find(parts[:-1])
+        if parent is None or not parent.children or parts[-1] not in parent.children:
+            return False
+        child = parent.children[parts[-1]]
+        return child is _LEAF or child.is_secret
+
+    def __iter__(self) -> Iterator[str]:
+        return self._iter_node(self._root, [])
+
+    def add(self, path: str) -> bool:
+        """Add a secret path, returns False if it was already present"""
+        parts = path.strip('/').split('/')
+        trail = [self._root]
+        node = self._root
+        for part in parts[:-1]:
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(part, False)
+            if child is False:
+                child = node.children[sys.intern(part)] = _Node()
+            elif child is _LEAF:
+                # A folder with the same name as an existing secret
+                child = node.children[part] = _Node()
+                child.is_secret = True
+                child.count = 1
+            node = child
+            trail.append(node)
+        if node.children is None:
+            node.children = {}
+        name = parts[-1]
+        child = node.children.get(name, False)
+        if child is _LEAF or (child is not False and child.is_secret):
+            return False
+        if child is False:
+            node.children[sys.intern(name)] = _LEAF
+        else:
+            child.is_secret = True
+            child.count += 1
+        for n in trail:
+            n.count += 1
+        return True
+
+    def remove(self, path: str) -> bool:
+        """Remove a secret path and prune empty folders"""
+        parts = path.strip('/').split('/')
+        trail = [self._root]
+        for part in parts[:-1]:
+            children = trail[-1].children
+            child = children.get(part, False) if children else False
+            if not child:
+                return False
+            trail.append(child)
+        parent = trail[-1]
+        name = parts[-1]
+        child = parent.children.get(name, False) if parent.children else False
+        if child is _LEAF:
+            del parent.children[name]
+        elif child is not False and child.is_secret:
+            child.is_secret = False
+            child.count -= 1
+            if not child.count:
+                del parent.children[name]
+        else:
+            return False
+        if not parent.children:
+            parent.children = None
+        for n in trail:
+            n.count -= 1
+        for i in range(len(trail) - 1, 0, -1):
+            if trail[i].count:
+                break
+            del trail[i - 1].children[parts[i - 1]]
+            if not trail[i - 1].children:
+                trail[i - 1].children = None
+        return True
+
+    def count(self, prefix: str = '') -> int:
+        """Number of secrets below a folder"""
+        node = self._find(self._split_folder(prefix))
+        return node.count if node else 0
+
+    def iter_prefix(self, prefix: str = '') -> Iterator[str]:
+        """Iterate over secret paths starting with prefix"""
+        parts = prefix.lstrip('/').split('/')
+        folder, partial = parts[:-1], parts[-1]
+        node = self._find(folder)
+        if node is None or node.children is None:
+            return
+        for name, child in node.children.items():
+            if name.startswith(partial):
+                if child is _LEAF:
+                    yield '/'.join(folder + [name])
+                else:
+                    yield from self._iter_node(child, folder + [name])
+
+    def list_folder(self, prefix: str = '') -> List[str]:
+        """Direct children of a folder, Vault LIST style (folders end with '/')"""
+        node = self._find(self._split_folder(prefix))
+        if node is None or node.children is None:
+            return []
+        keys = []
+        for name, child in node.children.items():
+            if child is _LEAF or child.is_secret:
+                keys.append(name)
+            if child is not _LEAF and child.children:
+                keys.append(f"{name}/")
+        return keys
+
+    def to_tree(self, prefix: str = '') -> Dict:
+        """Nested dict of a folder in the format served by the tree API"""
+        parts = self._split_folder(prefix)
+        node = self._find(parts)
+        if node is None:
+            return {}
+        return self._tree_node(node, '/'.join(parts))
+
+    def _split_folder(self, prefix: str) -> List[str]:
+        prefix = prefix.strip('/')
+        return prefix.split('/') if prefix else []
+
+    def _find(self, parts: List[str]) -> Optional[_Node]:
+        """Folder node for parts, None if missing or a plain secret"""
+        node = self._root
+        for part in parts:
+            if node is _LEAF or node.children is None:
+                return None
+            node = node.children.get(part)
+        return node
+
+    def _iter_node(self, node: _Node, parts: List[str]) -> Iterator[str]:
+        if node.is_secret:
+            yield '/'.join(parts)
+        if node.children:
+            for name, child in node.children.items():
+                parts.append(name)
+                if child is _LEAF:
+                    yield '/'.join(parts)
+                else:
+                    yield from self._iter_node(child, parts)
+                parts.pop()
+
+    def _tree_node(self, node: _Node, path: str) -> Dict:
+        tree = {}
+        for name, child in (node.children or {}).items():
+            child_path = f"{path}/{name}" if path else name
+            if child is not _LEAF and child.children:
+                tree[name] = self._tree_node(child, child_path)
+            else:
+                tree[name] = {'_is_secret': True, '_path': child_path}
+        return tree
@@ -0,0 +1,196 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'profiles')
+PROFILE_KEY = 'profile'
+PROFILE_DURATION = 60
+PROFILE_MAX_DURATION = 600
+# How often the profiled worker looks for a stop request, and how long a finished profile is kept
+CHECK_INTERVAL = 0.5
+PROFILE_KEEP = 86400
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads, separating on-CPU samples from waits
+    
+    A sample counts as on-CPU when the thread's own CPU clock moved by at least half the
+    interval since the previous sample, so time spent waiting on Vault shows in wall only.
+    Only the standard library is used, vault_tool.py loads this module for --profile too.
+    """
+    
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.wall: Dict[str, int] = {}
+        self.cpu: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = (0.0, 0.0)
+    
+    def start(self):
+        """Start sampling in a background thread"""
+        self._started = (time.perf_counter(), time.process_time())
+        self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._thread.start()
+    
+    def stop(self, prefix: str, top: int = 25) -> Dict:
+        """Stop sampling, write PREFIX.wall.folded, PREFIX.cpu.folded and PREFIX.summary.txt"""
+        self._stop.set()
+        self._thread.join()
+        wall_time = time.perf_counter() - self._started[0]
+        cpu_time = time.process_time() - self._started[1]
+        
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+        for kind, samples in (('wall', self.wall), ('cpu', self.cpu)):
+            # Collapsed stacks as read by flamegraph.pl and speedscope
+            with open(f"{prefix}.{kind}.folded", 'w') as f:
+                for stack, count in sorted(samples.items()):
+                    f.write(f"{stack} {count}\n")
+        
+        summary = {
+            'wall_seconds': round(wall_time, 3),
+            'cpu_seconds': round(cpu_time, 3),
+            'samples': sum(self.wall.values()),
+            'cpu_samples': sum(self.cpu.values()),
+            'top': self._top(top),
+            'files': [f"{prefix}.wall.folded", f"{prefix}.cpu.folded", f"{prefix}.summary.txt"]
+        }
+        with open(f"{prefix}.summary.txt", 'w') as f:
+            f.write(self.summary_text(summary) + '\n')
+        return summary
+    
+    def summary_text(self, summary: Dict) -> str:
+        """The summary as written to PREFIX.summary.txt"""
+        cpu_share = 100 * summary['cpu_seconds'] / max(summary['wall_seconds'], 1e-9)
+        lines = [
+            f"Wall time {summary['wall_seconds']:.3f}s, process CPU time {summary['cpu_seconds']:.3f}s "
+            f"({cpu_share:.0f}% of wall, all threads)",
+            f"{summary['samples']} thread samples every {self.interval * 1000:g}ms, "
+            f"{summary['cpu_samples']} of them on CPU",
+            '',
+            f"{'wall%':>7} {'cpu%':>7} {'self%':>7}  function (inclusive, % of thread samples)"
+        ]
+        for row in summary['top']:
+            lines.append(f"{row['wall_pct']:7.1f} {row['cpu_pct']:7.1f} {row['self_pct']:7.1f}  {row['function']}")
+        return '\n'.join(lines)
+    
+    def _sample(self):
+        me = threading.get_ident()
+        cpu_seen: Dict[int, float] = {}
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = f"{names.get(ident, ident)};{self._collapse(frame)}"
+                self.wall[stack] = self.wall.get(stack, 0) + 1
+                try:
+                    cpu = time.clock_gettime(time.pthread_getcpuclockid(ident))
+                except (AttributeError, OSError):
+                    continue
+                if ident in cpu_seen and cpu - cpu_seen[ident] >= self.interval / 2:
+                    self.cpu[stack] = self.cpu.get(stack, 0) + 1
+                cpu_seen[ident] = cpu
+    
+    def _collapse(self, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+    
+    def _top(self, top: int) -> List[Dict]:
+        """Functions by inclusive wall samples, as percentages of all thread samples"""
+        functions: Dict[str, Dict[str, int]] = {}
+        for kind, samples in (('wall', self.wall), ('cpu', self.cpu)):
+            for stack, count in samples.items():
+                frames = stack.split(';')[1:]
+                for frame in set(frames):
+                    functions.setdefault(frame, {'wall': 0, 'cpu': 0, 'self': 0})[kind] += count
+                if kind == 'wall' and frames:
+                    functions[frames[-1]]['self'] += count
+        total = sum(self.wall.values()) or 1
+        ranked = sorted(functions.items(), key=lambda item: item[1]['wall'], reverse=True)[:top]
+        return [
+            {
+                'function': frame,
+                'wall_pct': round(100 * counts['wall'] / total, 1),
+                'cpu_pct': round(100 * counts['cpu'] / total, 1),
+                'self_pct': round(100 * counts['self'] / total, 1)
+            }
+            for frame, counts in ranked
+        ]
+
+
+class SharedProfiler:
+    """Profiles one server process at a time with SamplingProfiler
+    
+    The profile runs in the worker that got the start request and is recorded in the state
+    store, so a stop request reaching any other worker can end it. It also ends on its own
+    once its duration has passed, then writes its files and stores the summary.
+    """
+    
+    def __init__(self, store):
+        self.store = store
+    
+    def status(self) -> Optional[Dict]:
+        """The running or last finished profile"""
+        return self.store.cache_get(PROFILE_KEY, PROFILE_KEEP)
+    
+    def running(self, record: Optional[Dict]) -> bool:
+        # A worker that died while profiling leaves a record that is never finished
+        return bool(record) and not record.get('summary') and time.time() < record['until'] + 10 * CHECK_INTERVAL
+    
+    def start(self, interval: float, top: int, duration: float) -> Optional[Dict]:
+        """Start profiling this worker, None when a profile is already running"""
+        if self.running(self.status()):
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        record = {
+            'id': uuid.uuid4().hex[:8],
+            'pid': os.getpid(),
+            'prefix': os.path.join(PROFILE_DIR, datetime.now().strftime('%Y%m%dT%H%M%S')),
+            'interval': interval,
+            'top': top,
+            'until': time.time() + duration,
+            'stop': False,
+            'summary': None
+        }
+        self.store.cache_put(PROFILE_KEY, record)
+        profile = SamplingProfiler(interval)
+        profile.start()
+        threading.Thread(target=self._watch, args=(profile, record['id'], record['prefix']), name='profiler-watch', daemon=True).start()
+        return record
+    
+    def stop(self, top: Optional[int] = None, timeout: float = 10) -> Optional[Dict]:
+        """Ask the profiled worker to stop and wait for its summary, None when nothing runs"""
+        record = self.status()
+        if not self.running(record):
+            return None
+        record['stop'] = True
+        if top is not None:
+            record['top'] = top
+        self.store.cache_put(PROFILE_KEY, record)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            current = self.status()
+            if not current or current['id'] != record['id'] or current.get('summary'):
+                return current
+            time.sleep(CHECK_INTERVAL / 2)
+        return self.status()
+    
+    def _watch(self, profile: SamplingProfiler, profile_id: str, prefix: str):
+        while True:
+            time.sleep(CHECK_INTERVAL)
+            record = self.status()
+            if not record or record['id'] != profile_id or record['stop'] or time.time() >= record['until']:
+                break
+        summary = profile.stop(prefix, record['top'] if record and record['id'] == profile_id else 25)
+        if record and record['id'] == profile_id:
+            record['summary'] = summary
+            self.store.cache_put(PROFILE_KEY, record)
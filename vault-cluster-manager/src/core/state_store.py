@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from itertools import count
+from typing import Any, Dict, List, Optional
+
+STATE_DB_ENV = 'VAULT_GUI_STATE_DB'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS clusters (
+    name TEXT PRIMARY KEY, url TEXT NOT NULL, token TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '', timeout REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generations (cluster TEXT PRIMARY KEY, generation INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored REAL NOT NULL, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, status TEXT NOT NULL, started TEXT NOT NULL, data TEXT NOT NULL
+);
+"""
+
+
+class MemoryStore:
+    """Process local state, enough for the single process development server"""
+    
+    shared = False
+    
+    def __init__(self):
+        self.instance_id = uuid.uuid4().hex[:8]
+        self._cache: Dict[str, tuple] = {}
+        self._generations: Dict[str, int] = {}
+        self._counter = count(1)
+        self._clusters: Dict[str, Dict] = {}
+        self._registry_version = 0
+        self._lock = threading.Lock()
+    
+    def cache_get(self, key: str, max_age: float) -> Optional[Any]:
+        cached = self._cache.get(key)
+        if cached and time.time() - cached[0] < max_age:
+            return cached[1]
+        return None
+    
+    def cache_put(self, key: str, value: Any):
+        self._cache[key] = (time.time(), value)
+    
+    def cache_drop(self, key: str):
+        self._cache.pop(key, None)
+    
+    def generation(self, cluster: str) -> int:
+        return self._generations.get(cluster, 0)
+    
+    def next_generation(self, cluster: str) -> int:
+        self._generations[cluster] = next(self._counter)
+        return self._generations[cluster]
+    
+    def registry_version(self) -> int:
+        return self._registry_version
+    
+    def list_clusters(self) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._clusters.values()]
+    
+    def save_cluster(self, row: Dict) -> int:
+        with self._lock:
+            self._clusters[row['name']] = dict(row)
+            self._registry_version += 1
+            return self._registry_version
+    
+    def remove_cluster(self, name: str) -> int:
+        with self._lock:
+            self._clusters.pop(name, None)
+            self._registry_version += 1
+            return self._registry_version
+
+
+class SQLiteStore:
+    """State shared by all workers of a deployment, kept in a SQLite database in WAL mode"""
+    
+    shared = True
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._db()
+        # Holds cluster tokens, like clusters.yaml
+        os.chmod(path, 0o600)
+        db.executescript(SCHEMA)
+        db.execute("INSERT OR IGNORE INTO meta VALUES ('instance_id', ?)", (uuid.uuid4().hex[:8],))
+        db.execute("INSERT OR IGNORE INTO meta VALUES ('registry_version', '0')")
+        self.instance_id = self._meta('instance_id')
+    
+    def _db(self) -> sqlite3.Connection:
+        """Connection of the calling thread, opened again after a fork"""
+        if getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return self._local.db
+    
+    def _meta(self, key: str) -> str:
+        return self._db().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()[0]
+    
+    # ============ Cached Catalogs ============
+    
+    def cache_get(self, key: str, max_age: float) -> Optional[Any]:
+        row = self._db().execute(
+            'SELECT value FROM cache WHERE key = ? AND stored > ?', (key, time.time() - max_age)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def cache_put(self, key: str, value: Any):
+        self._db().execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', (key, time.time(), json.dumps(value))
+        )
+    
+    def cache_drop(self, key: str):
+        self._db().execute('DELETE FROM cache WHERE key = ?', (key,))
+    
+    def generation(self, cluster: str) -> int:
+        row = self._db().execute(
+            'SELECT generation FROM generations WHERE cluster = ?', (cluster,)
+        ).fetchone()
+        return row[0] if row else 0
+    
+    def next_generation(self, cluster: str) -> int:
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute(
+                'INSERT INTO generations VALUES (?, 1) '
+                'ON CONFLICT(cluster) DO UPDATE SET generation = generation + 1', (cluster,)
+            )
+            return db.execute('SELECT generation FROM generations WHERE cluster = ?', (cluster,)).fetchone()[0]
+    
+    # ============ Cluster Registry ============
+    
+    def registry_version(self) -> int:
+        return int(self._meta('registry_version'))
+    
+    def list_clusters(self) -> List[Dict]:
+        rows = self._db().execute('SELECT name, url, token, description, timeout FROM clusters').fetchall()
+        return [
+            {'name': r[0], 'url': r[1], 'token': r[2], 'description': r[3], 'timeout': r[4]}
+            for r in rows
+        ]
+    
+    def save_cluster(self, row: Dict) -> int:
+        return self._registry_change(
+            'INSERT OR REPLACE INTO clusters VALUES (?, ?, ?, ?, ?)',
+            (row['name'], row['url'], row['token'], row['description'], row['timeout'])
+        )
+    
+    def remove_cluster(self, name: str) -> int:
+        return self._registry_change('DELETE FROM clusters WHERE name = ?', (name,))
+    
+    def _registry_change(self, sql: str, params: tuple) -> int:
+        """Apply a registry change and bump the registry version in one transaction"""
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute(sql, params)
+            db.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'registry_version'")
+            return int(db.execute("SELECT value FROM meta WHERE key = 'registry_version'").fetchone()[0])
+    
+    # ============ Jobs ============
+    
+    def save_job(self, job: Dict):
+        self._db().execute(
+            'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)',
+            (job['id'], job['status'], job['started'], json.dumps(job))
+        )
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        row = self._db().execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def list_jobs(self) -> List[Dict]:
+        rows = self._db().execute('SELECT data FROM jobs ORDER BY started DESC').fetchall()
+        return [json.loads(r[0]) for r in rows]
+    
+    def prune_jobs(self, max_finished: int):
+        self._db().execute(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status != 'running' "
+            "ORDER BY started DESC LIMIT -1 OFFSET ?)", (max_finished,)
+        )
+
+
+def open_store():
+    """SQLite store when VAULT_GUI_STATE_DB names a database, process local state otherwise"""
+    path = os.environ.get(STATE_DB_ENV)
+    return SQLiteStore(path) if path else MemoryStore()
@@ -0,0 +1,214 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import hvac
+
+TRACE_SAMPLE_ENV = 'VAULT_GUI_TRACE_SAMPLE'
+TRACE_BUFFER = 200000
+TRACE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'traces')
+TRACE_KEY = 'trace'
+# How often a worker picks up the shared sample rate and writes its new spans to its file
+SYNC_INTERVAL = 1.0
+
+
+class Tracer:
+    """Records spans of Vault calls and operation stages as Chrome trace events
+    
+    The outermost span of each thread decides whether it and everything below it is
+    recorded, so a low sample rate keeps whole call trees; the newest spans are kept
+    in a ring buffer, which lets tracing stay on in production.
+    
+    With a shared state store the sample rate lives in the store and every worker also
+    writes its spans to its own file under TRACE_DIR, so any worker can change the rate
+    and serve the spans of all workers.
+    """
+    
+    def __init__(self, sample: float = 0.0, buffer: int = TRACE_BUFFER):
+        self.sample = sample
+        self.events = deque(maxlen=buffer)
+        self.threads: Dict[int, str] = {}
+        self.store = None
+        self._local = threading.local()
+        # Timestamps are on the wall clock, so spans of different workers line up
+        self._epoch = time.time() - time.perf_counter()
+        self._cleared = 0.0
+        self._pending: List[Dict] = []
+        self._pending_lock = threading.Lock()
+        self._written = 0
+        self._syncer: Optional[int] = None
+    
+    def share(self, store):
+        """Share the sample rate and spans across the workers using store"""
+        if not store.shared:
+            return
+        self.store = store
+        record = store.cache_get(TRACE_KEY, float('inf'))
+        if record:
+            self.sample = record['sample']
+            self._cleared = record['cleared']
+    
+    @contextmanager
+    def span(self, name: str, category: str = 'stage', **args):
+        if self.store is not None and self._syncer != os.getpid():
+            self._start_syncer()
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            self._local.sampled = self.sample > 0 and random.random() < self.sample
+        self._local.depth = depth + 1
+        start = time.perf_counter() if self._local.sampled else None
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if start is not None:
+                end = time.perf_counter()
+                tid = threading.get_native_id()
+                event = {
+                    'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                    'ts': round((start + self._epoch) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)
+                }
+                if args:
+                    event['args'] = args
+                # deque.append is atomic, no lock needed
+                self.events.append(event)
+                new_thread = tid not in self.threads
+                self.threads[tid] = threading.current_thread().name
+                if self.store is not None:
+                    self._queue(event, self._thread_event(tid) if new_thread else None)
+    
+    def configure(self, sample: float, clear: bool = False):
+        """Set the sample rate for every worker, clear drops the spans recorded so far"""
+        self.sample = sample
+        if clear:
+            self._cleared = time.time()
+            self.clear()
+        if self.store is not None:
+            self.store.cache_put(TRACE_KEY, {'sample': self.sample, 'cleared': self._cleared})
+            if clear and os.path.isdir(TRACE_DIR):
+                for file in os.listdir(TRACE_DIR):
+                    os.remove(os.path.join(TRACE_DIR, file))
+    
+    def clear(self):
+        with self._pending_lock:
+            self.events.clear()
+            self.threads.clear()
+            self._pending = []
+            self._written = 0
+    
+    def chrome_trace(self) -> Dict:
+        """Recorded spans as Chrome trace-event JSON, opens in Perfetto or chrome://tracing"""
+        if self.store is None:
+            events = list(self.events)
+            for tid in list(self.threads):
+                events.append(self._thread_event(tid))
+        else:
+            self._sync()
+            events = self._read_files()
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'sample': self.sample, 'buffer': self.events.maxlen}
+        }
+    
+    def trace_vault_calls(self):
+        """Wrap hvac's RawAdapter.request, which every client request goes through"""
+        adapters = getattr(hvac, 'adapters', None)
+        if adapters is None or getattr(adapters.RawAdapter.request, 'traced', False):
+            return
+        request = adapters.RawAdapter.request
+        
+        def traced_request(adapter, method, url, *args, **kwargs):
+            with self.span(f"{method.upper()} {url}", 'vault'):
+                return request(adapter, method, url, *args, **kwargs)
+        traced_request.traced = True
+        adapters.RawAdapter.request = traced_request
+    
+    # ============ Sharing Across Workers ============
+    
+    def _thread_event(self, tid: int) -> Dict:
+        return {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': self.threads[tid]}}
+    
+    def _queue(self, event: Dict, thread_event: Optional[Dict]):
+        with self._pending_lock:
+            if thread_event:
+                self._pending.append(thread_event)
+            self._pending.append(event)
+    
+    def _start_syncer(self):
+        # Started by the first span of each worker process, a thread started before the fork would not survive it
+        with self._pending_lock:
+            if self._syncer == os.getpid():
+                return
+            self._syncer = os.getpid()
+        self.clear()
+        threading.Thread(target=self._sync_loop, name='trace-sync', daemon=True).start()
+    
+    def _sync_loop(self):
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            try:
+                self._sync()
+            except Exception:
+                # Tracing must never take a worker down, the next round tries again
+                pass
+    
+    def _sync(self):
+        """Pick up the shared settings and append new spans to this worker's file"""
+        record = self.store.cache_get(TRACE_KEY, float('inf'))
+        if record:
+            self.sample = record['sample']
+            if record['cleared'] > self._cleared:
+                self._cleared = record['cleared']
+                self.clear()
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            file = os.path.join(TRACE_DIR, f"{os.getpid()}.jsonl")
+            if self._written + len(pending) > 2 * self.events.maxlen:
+                # Rewrite from the ring buffer, so a file holds at most twice the buffer
+                events = [self._thread_event(tid) for tid in list(self.threads)] + list(self.events)
+                tmp_file = f"{file}.tmp"
+                with open(tmp_file, 'w') as f:
+                    f.writelines(json.dumps(event) + '\n' for event in events)
+                os.replace(tmp_file, file)
+                self._written = len(events)
+            else:
+                with open(file, 'a') as f:
+                    f.writelines(json.dumps(event) + '\n' for event in pending)
+                self._written += len(pending)
+    
+    def _read_files(self) -> List[Dict]:
+        events = []
+        if not os.path.isdir(TRACE_DIR):
+            return events
+        cleared = self._cleared * 1e6
+        for name in sorted(os.listdir(TRACE_DIR)):
+            if not name.endswith('.jsonl'):
+                continue
+            try:
+                with open(os.path.join(TRACE_DIR, name)) as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # The last line of a file that is being appended to
+                    continue
+                # Spans that started before the last clear may still sit in a file written meanwhile
+                if event['ph'] == 'M' or event['ts'] >= cleared:
+                    events.append(event)
+        return events
+
+
+tracer = Tracer(float(os.environ.get(TRACE_SAMPLE_ENV, '0')))
+tracer.trace_vault_calls()
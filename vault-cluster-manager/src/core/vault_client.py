@@ -3,24 +3,44 @@ import json
 import yaml
 import hvac
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from time import time
 from typing import Dict, List, Optional, Any
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
+from core.jobs import JobRegistry, RateLimiter
+from core.nodes import NodeSession, split_urls
+from core.path_store import PathStore
+from core.state_store import MemoryStore
+from core.tracing import tracer
+
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'clusters.yaml')
+CACHE_TTL = 300
+CONNECT_TIMEOUT = 10
+LOAD_WORKERS = 16
+BATCH_MAX_ITEMS = 500
+BATCH_WORKERS = 16
+TREE_OP_WORKERS = 8
+TREE_OP_RATE = 50
 
 
 class VaultCluster:
     """Represents a single Vault cluster connection"""
     
-    def __init__(self, name: str, url: str, token: str, description: str = ''):
+    def __init__(self, name: str, url: str, token: str, description: str = '',
+                 timeout: float = CONNECT_TIMEOUT):
         self.name = name
         self.url = url
         self.token = token
         self.description = description
+        self.timeout = timeout
         self.client: Optional[hvac.Client] = None
+        # Set when url lists several nodes of an HA cluster
+        self.nodes: Optional[NodeSession] = None
         self.connected = False
         self.last_check: Optional[datetime] = None
         self.error: Optional[str] = None
@@ -28,7 +48,13 @@ class VaultCluster:
     def connect(self) -> bool:
         """Establish connection to Vault"""
         try:
-            self.client = hvac.Client(url=self.url, token=self.token, verify=False)
+            urls = split_urls(self.url)
+            if len(urls) < 2:
+                self.nodes = None
+            elif self.nodes is None or [node.url for node in self.nodes.nodes] != urls:
+                self.nodes = NodeSession(urls, verify=False)
+            self.client = hvac.Client(url=urls[0], token=self.token, verify=False,
+                                      timeout=self.timeout, session=self.nodes)
             if self.client.is_authenticated():
                 self.connected = True
                 self.error = None
@@ -75,9 +101,14 @@ class VaultCluster:
 class VaultManager:
     """Manages multiple Vault cluster connections"""
     
-    def __init__(self):
+    def __init__(self, store=None):
         self.clusters: Dict[str, VaultCluster] = {}
+        # Cluster registry, cached listings, catalog generations and, when shared, jobs
+        self.store = store or MemoryStore()
+        self._registry_version = self.store.registry_version()
+        self.jobs = JobRegistry(store=self.store if self.store.shared else None)
         self._ensure_config_dir()
+        self.refresh_registry(force=True)
     
     def _ensure_config_dir(self):
         """Ensure config directory exists"""
@@ -87,7 +118,44 @@ class VaultManager:
     
     # ============ Cluster Management ============
     
-    def add_cluster(self, name: str, url: str, token: str, description: str = '') -> Dict:
+    def refresh_registry(self, force: bool = False):
+        """Pick up clusters added, changed or removed by other workers sharing the store"""
+        version = self.store.registry_version()
+        if version == self._registry_version and not force:
+            return
+        
+        rows = {row['name']: row for row in self.store.list_clusters()}
+        for name in list(self.clusters):
+            if name not in rows:
+                self.clusters.pop(name).disconnect()
+        for name, row in rows.items():
+            cluster = self.clusters.get(name)
+            if cluster is None:
+                # Connected on first use, like any cluster that lost its connection
+                self.clusters[name] = VaultCluster(**row)
+            elif (cluster.url, cluster.token, cluster.timeout) != (row['url'], row['token'], row['timeout']):
+                cluster.url, cluster.token, cluster.timeout = row['url'], row['token'], row['timeout']
+                cluster.disconnect()
+            if cluster is not None:
+                cluster.description = row['description']
+        self._registry_version = version
+    
+    def _registry_changed(self, version: int):
+        """Record our own registry change, unless another worker changed it too"""
+        if version == self._registry_version + 1:
+            self._registry_version = version
+    
+    def _save_cluster(self, cluster: VaultCluster):
+        self._registry_changed(self.store.save_cluster({
+            'name': cluster.name,
+            'url': cluster.url,
+            'token': cluster.token,
+            'description': cluster.description,
+            'timeout': cluster.timeout
+        }))
+    
+    def add_cluster(self, name: str, url: str, token: str, description: str = '',
+                    timeout: float = CONNECT_TIMEOUT) -> Dict:
         """Add a new cluster and test connection"""
         if name in self.clusters:
             return {'success': False, 'message': f'Cluster "{name}" already exists'}
@@ -95,9 +163,10 @@ class VaultManager:
         # Normalize URL
         url = url.rstrip('/')
         
-        cluster = VaultCluster(name, url, token, description)
+        cluster = VaultCluster(name, url, token, description, timeout)
         if cluster.connect():
             self.clusters[name] = cluster
+            self._save_cluster(cluster)
             return {
                 'success': True,
                 'message': f'Cluster "{name}" added and connected successfully',
@@ -122,8 +191,12 @@ class VaultManager:
             cluster.token = data['token']
         if 'description' in data:
             cluster.description = data['description']
+        if 'timeout' in data:
+            cluster.timeout = data['timeout']
         
         # Reconnect with new settings
+        self._save_cluster(cluster)
+        self._invalidate_cache(name, mounts=True)
         cluster.disconnect()
         if cluster.connect():
             return {
@@ -144,6 +217,8 @@ class VaultManager:
         
         self.clusters[name].disconnect()
         del self.clusters[name]
+        self._registry_changed(self.store.remove_cluster(name))
+        self._invalidate_cache(name, mounts=True)
         return {'success': True, 'message': f'Cluster "{name}" removed'}
     
     def list_clusters(self) -> Dict:
@@ -186,25 +261,60 @@ class VaultManager:
                 'message': f'Not connected: {cluster.error}'
             }
         
+        return {
+            'success': True,
+            'cluster': cluster.to_safe_dict(),
+            'vault_status': self._vault_status(cluster),
+            'nodes': cluster.nodes.status() if cluster.nodes else None
+        }
+    
+    def _vault_status(self, cluster: VaultCluster) -> Dict:
+        """Read the health endpoint of a connected cluster"""
         try:
-            # Get Vault status
             status = cluster.client.sys.read_health_status(method='GET')
             return {
-                'success': True,
-                'cluster': cluster.to_safe_dict(),
-                'vault_status': {
-                    'initialized': status.get('initialized', False),
-                    'sealed': status.get('sealed', False),
-                    'version': status.get('version', 'unknown'),
-                    'cluster_name': status.get('cluster_name', 'unknown')
-                }
+                'initialized': status.get('initialized', False),
+                'sealed': status.get('sealed', False),
+                'version': status.get('version', 'unknown'),
+                'cluster_name': status.get('cluster_name', 'unknown')
             }
         except Exception as e:
-            return {
-                'success': True,
-                'cluster': cluster.to_safe_dict(),
-                'vault_status': {'error': str(e)}
-            }
+            return {'error': str(e)}
+    
+    def get_cluster_overview(self, name: str) -> Dict:
+        """Status, mount points and the first tree level in one call, fetched concurrently"""
+        if name not in self.clusters:
+            return {'success': False, 'message': f'Cluster "{name}" not found'}
+        
+        cluster = self.clusters[name]
+        if not cluster.connected or not cluster.client:
+            cluster.connect()
+        
+        if not cluster.connected:
+            return {'success': False, 'message': f'Not connected: {cluster.error}'}
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            status_future = executor.submit(self._vault_status, cluster)
+            mounts_result = self._recent_mount_points(name)
+            
+            tree = {}
+            if mounts_result['success']:
+                for mp, keys in self._recent_top_levels(name, mounts_result['mounts']).items():
+                    tree[mp] = {
+                        key.rstrip('/'): {} if key.endswith('/') else {'_is_secret': True, '_path': f"{mp}/{key}"}
+                        for key in keys
+                    }
+            vault_status = status_future.result()
+        
+        return {
+            'success': True,
+            'cluster': cluster.to_safe_dict(),
+            'vault_status': vault_status,
+            'mounts': mounts_result.get('mounts', []),
+            'mounts_error': None if mounts_result['success'] else mounts_result['message'],
+            'tree': tree,
+            'complete': False
+        }
     
     # ============ Mount Points ============
     
@@ -230,17 +340,72 @@ class VaultManager:
                     'description': config.get('description', ''),
                     'options': config.get('options', {})
                 })
-            return {'success': True, 'mounts': sorted(mounts, key=lambda x: x['path'])}
+            result = {'success': True, 'mounts': sorted(mounts, key=lambda x: x['path'])}
+            self.store.cache_put(f"mounts:{name}", result)
+            return result
         except hvac.exceptions.Forbidden:
             return {'success': False, 'message': 'Permission denied to list mount points'}
         except Exception as e:
             return {'success': False, 'message': str(e)}
     
+    def _recent_mount_points(self, name: str) -> Dict:
+        """Mount points listed in the last CACHE_TTL seconds, listed again otherwise"""
+        cached = self.store.cache_get(f"mounts:{name}", CACHE_TTL)
+        return cached if cached else self.list_mount_points(name)
+    
+    def _recent_top_levels(self, name: str, mounts: List[Dict]) -> Dict[str, List[str]]:
+        """First level keys of each KV mount, listed concurrently unless cached in the last CACHE_TTL seconds"""
+        kv_mounts = [m['path'].rstrip('/') for m in mounts if m['type'] == 'kv']
+        cached = self.store.cache_get(f"levels:{name}", CACHE_TTL)
+        if cached and set(kv_mounts) <= cached.keys():
+            return {mp: cached[mp] for mp in kv_mounts}
+        
+        client = self.clusters[name].client
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            levels = dict(executor.map(lambda mp: (mp, self._list_level(client, mp)), kv_mounts))
+        self.store.cache_put(f"levels:{name}", levels)
+        return levels
+    
+    def _invalidate_cache(self, name: str, mounts: bool = False):
+        """Drop cached listings of a cluster and move its catalog generation after its secrets (or its mounts) change"""
+        self.store.next_generation(name)
+        self.store.cache_drop(f"levels:{name}")
+        if mounts:
+            self.store.cache_drop(f"mounts:{name}")
+    
+    def catalog_etag(self, name: str) -> str:
+        """Validator of the cluster views, changes with every GUI write and at least every CACHE_TTL seconds"""
+        # The time bucket bounds how long changes made outside the GUI can stay hidden
+        return f"{self.store.instance_id}-{self.store.generation(name)}-{int(time() // CACHE_TTL)}"
+    
+    def warm_cache(self, names: List[str]) -> threading.Thread:
+        """Fetch mount points and first tree levels of clusters in a background thread"""
+        def warm(name):
+            # Another worker sharing the store may have warmed it already
+            mounts_result = self._recent_mount_points(name)
+            if mounts_result['success']:
+                self._recent_top_levels(name, mounts_result['mounts'])
+        
+        def run():
+            with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, max(len(names), 1))) as executor:
+                list(executor.map(warm, names))
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+    
     # ============ Secrets Operations ============
     
-    def _list_recursive(self, client: hvac.Client, mount_point: str, path: str = '') -> List[str]:
-        """Recursively list all secrets"""
-        secrets = []
+    def _list_level(self, client: hvac.Client, mount_point: str, path: str = '') -> List[str]:
+        """List the direct children of a folder"""
+        try:
+            response = client.secrets.kv.v2.list_secrets(path=path, mount_point=mount_point)
+            return response.get('data', {}).get('keys', [])
+        except Exception:
+            return []
+    
+    def _walk_secrets(self, client: hvac.Client, mount_point: str, path: str, store: PathStore):
+        """Recursively add all secrets below path to a path store"""
         try:
             response = client.secrets.kv.v2.list_secrets(path=path, mount_point=mount_point)
             keys = response.get('data', {}).get('keys', [])
@@ -248,14 +413,13 @@ class VaultManager:
             for key in keys:
                 full_path = f"{path}{key}" if path else key
                 if key.endswith('/'):
-                    secrets.extend(self._list_recursive(client, mount_point, full_path))
+                    self._walk_secrets(client, mount_point, full_path, store)
                 else:
-                    secrets.append(f"{mount_point}/{full_path}")
+                    store.add(f"{mount_point}/{full_path}")
         except hvac.exceptions.InvalidPath:
             pass
         except Exception:
             pass
-        return secrets
     
     def list_secrets(self, name: str, mount_point: Optional[str] = None, path: str = '') -> Dict:
         """List secrets in a cluster"""
@@ -270,21 +434,21 @@ class VaultManager:
             return {'success': False, 'message': f'Not connected: {cluster.error}'}
         
         try:
-            secrets = []
+            store = PathStore()
             
             if mount_point:
                 # List secrets in specific mount point
-                secrets = self._list_recursive(cluster.client, mount_point.rstrip('/'), path)
+                self._walk_secrets(cluster.client, mount_point.rstrip('/'), path, store)
             else:
                 # List secrets in all mount points
-                mounts_result = self.list_mount_points(name)
+                mounts_result = self._recent_mount_points(name)
                 if mounts_result['success']:
                     for mount in mounts_result['mounts']:
                         if mount['type'] == 'kv':
                             mp = mount['path'].rstrip('/')
-                            secrets.extend(self._list_recursive(cluster.client, mp, path))
+                            self._walk_secrets(cluster.client, mp, path, store)
             
-            return {'success': True, 'secrets': secrets, 'count': len(secrets)}
+            return {'success': True, 'secrets': list(store), 'count': len(store)}
         except Exception as e:
             return {'success': False, 'message': str(e)}
     
@@ -302,38 +466,21 @@ class VaultManager:
         
         try:
             tree = {}
-            mounts_result = self.list_mount_points(name)
+            store = PathStore()
+            mounts_result = self._recent_mount_points(name)
             
             if mounts_result['success']:
                 for mount in mounts_result['mounts']:
                     if mount['type'] == 'kv':
                         mp = mount['path'].rstrip('/')
-                        secrets = self._list_recursive(cluster.client, mp)
-                        tree[mp] = self._build_tree(secrets, mp)
+                        with tracer.span('walk', mount=mp):
+                            self._walk_secrets(cluster.client, mp, '', store)
+                        tree[mp] = store.to_tree(mp)
             
             return {'success': True, 'tree': tree}
         except Exception as e:
             return {'success': False, 'message': str(e)}
     
-    def _build_tree(self, secrets: List[str], mount_point: str) -> Dict:
-        """Build a tree structure from flat secret paths"""
-        tree = {}
-        prefix = f"{mount_point}/"
-        
-        for secret in secrets:
-            if secret.startswith(prefix):
-                path = secret[len(prefix):]
-                parts = path.split('/')
-                current = tree
-                for i, part in enumerate(parts):
-                    if i == len(parts) - 1:
-                        current[part] = {'_is_secret': True, '_path': secret}
-                    else:
-                        if part not in current:
-                            current[part] = {}
-                        current = current[part]
-        return tree
-    
     def read_secret(self, name: str, mount_point: str, path: str) -> Dict:
         """Read a specific secret"""
         if name not in self.clusters:
@@ -346,8 +493,12 @@ class VaultManager:
         if not cluster.connected or not cluster.client:
             return {'success': False, 'message': f'Not connected: {cluster.error}'}
         
+        return self._read(cluster.client, mount_point, path)
+    
+    def _read(self, client: hvac.Client, mount_point: str, path: str) -> Dict:
+        """Read a secret with an already connected client"""
         try:
-            response = cluster.client.secrets.kv.v2.read_secret_version(
+            response = client.secrets.kv.v2.read_secret_version(
                 path=path,
                 mount_point=mount_point,
                 raise_on_deleted_version=True
@@ -375,8 +526,14 @@ class VaultManager:
         if not cluster.connected or not cluster.client:
             return {'success': False, 'message': f'Not connected: {cluster.error}'}
         
+        result = self._write(cluster.client, mount_point, path, data)
+        self._invalidate_cache(name)
+        return result
+    
+    def _write(self, client: hvac.Client, mount_point: str, path: str, data: Dict) -> Dict:
+        """Write a secret with an already connected client"""
         try:
-            cluster.client.secrets.kv.v2.create_or_update_secret(
+            client.secrets.kv.v2.create_or_update_secret(
                 path=path,
                 mount_point=mount_point,
                 secret=data
@@ -388,6 +545,94 @@ class VaultManager:
         except Exception as e:
             return {'success': False, 'message': str(e)}
     
+    def _split_item_path(self, item) -> tuple:
+        """Mount point and path of a batch item, a full path or a dict with mount_point + path or a full path
+        
+        Anything else gives empty strings, which the batch reports as an invalid item.
+        """
+        if isinstance(item, str):
+            return self._parse_path(item)
+        if not isinstance(item, dict) or not isinstance(item.get('path', ''), str):
+            return '', ''
+        if item.get('mount_point'):
+            if not isinstance(item['mount_point'], str):
+                return '', ''
+            return item['mount_point'].strip('/'), item.get('path', '')
+        return self._parse_path(item.get('path', ''))
+    
+    def _item_label(self, item) -> str:
+        """What a failed batch item is reported as"""
+        if isinstance(item, dict):
+            return str(item.get('path', ''))
+        return item if isinstance(item, str) else ''
+    
+    def _connected_client(self, name: str):
+        """Connected client of a cluster, or an error result"""
+        if name not in self.clusters:
+            return None, {'success': False, 'message': f'Cluster "{name}" not found'}
+        
+        cluster = self.clusters[name]
+        if not cluster.connected:
+            cluster.connect()
+        
+        if not cluster.connected or not cluster.client:
+            return None, {'success': False, 'message': f'Not connected: {cluster.error}'}
+        return cluster.client, None
+    
+    def _run_batch(self, func, items: List) -> List[Dict]:
+        """Run func over items concurrently, keeping input order"""
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, max(len(items), 1))) as executor:
+            return list(executor.map(func, items))
+    
+    def read_secrets_batch(self, name: str, items: List[Dict]) -> Dict:
+        """Read several secrets concurrently"""
+        if len(items) > BATCH_MAX_ITEMS:
+            return {'success': False, 'message': f'At most {BATCH_MAX_ITEMS} items per batch'}
+        client, error = self._connected_client(name)
+        if error:
+            return error
+        
+        def read(item):
+            mount_point, path = self._split_item_path(item)
+            if not mount_point or not path:
+                return {'success': False, 'path': self._item_label(item), 'message': 'Invalid item, expected a path or {mount_point, path}'}
+            result = self._read(client, mount_point, path)
+            result.setdefault('path', f"{mount_point}/{path}")
+            return result
+        
+        results = self._run_batch(read, items)
+        failed = sum(1 for r in results if not r['success'])
+        return {
+            'success': failed == 0,
+            'results': results,
+            'message': f'Read {len(results) - failed} secrets, {failed} errors'
+        }
+    
+    def write_secrets_batch(self, name: str, items: List[Dict]) -> Dict:
+        """Write several secrets concurrently"""
+        if len(items) > BATCH_MAX_ITEMS:
+            return {'success': False, 'message': f'At most {BATCH_MAX_ITEMS} items per batch'}
+        client, error = self._connected_client(name)
+        if error:
+            return error
+        
+        def write(item):
+            mount_point, path = self._split_item_path(item)
+            if not mount_point or not path or not isinstance(item, dict) or not isinstance(item.get('data'), dict):
+                return {'success': False, 'path': self._item_label(item), 'message': 'Invalid item, path and data are required'}
+            result = self._write(client, mount_point, path, item['data'])
+            result['path'] = f"{mount_point}/{path}"
+            return result
+        
+        results = self._run_batch(write, items)
+        self._invalidate_cache(name)
+        failed = sum(1 for r in results if not r['success'])
+        return {
+            'success': failed == 0,
+            'results': results,
+            'message': f'Wrote {len(results) - failed} secrets, {failed} errors'
+        }
+    
     def delete_secret(self, name: str, mount_point: str, path: str) -> Dict:
         """Delete a secret"""
         if name not in self.clusters:
@@ -405,6 +650,7 @@ class VaultManager:
                 path=path,
                 mount_point=mount_point
             )
+            self._invalidate_cache(name)
             return {
                 'success': True,
                 'message': f'Secret {mount_point}/{path} deleted'
@@ -412,6 +658,116 @@ class VaultManager:
         except Exception as e:
             return {'success': False, 'message': str(e)}
     
+    # ============ Subtree Operations ============
+    
+    def _subtree(self, client: hvac.Client, full_path: str) -> List[str]:
+        """A secret path, or every secret below it when it ends with '/'"""
+        mount_point, path = self._parse_path(full_path)
+        if not full_path.endswith('/'):
+            return [f"{mount_point}/{path}"]
+        store = PathStore()
+        self._walk_secrets(client, mount_point, path, store)
+        return list(store)
+    
+    def _start_tree_job(self, job_type: str, name: str, items: List, func, rate: float) -> Dict:
+        """Run func over items in a background thread pool, tracked as a job"""
+        job = self.jobs.create(job_type, name, len(items))
+        limiter = RateLimiter(rate)
+        
+        def run_item(item):
+            path = item[0] if isinstance(item, tuple) else item
+            try:
+                limiter.wait()
+                with tracer.span(job_type, job=job['id'], path=path):
+                    func(item)
+                self.jobs.advance(job['id'])
+            except Exception as e:
+                self.jobs.advance(job['id'], {'path': path, 'error': str(e)})
+        
+        def run():
+            with ThreadPoolExecutor(max_workers=TREE_OP_WORKERS) as executor:
+                list(executor.map(run_item, items))
+            self._invalidate_cache(name)
+            done = self.jobs.get(job['id'])
+            self.jobs.finish(job['id'], f"{job_type}: {done['done'] - done['failed']} secrets, {done['failed']} errors")
+        
+        threading.Thread(target=run, daemon=True).start()
+        return job
+    
+    def delete_tree(self, name: str, path: str, dry_run: bool = False, rate: float = TREE_OP_RATE) -> Dict:
+        """Delete a secret, or all secrets below a folder path ending with '/'"""
+        client, error = self._connected_client(name)
+        if error:
+            return error
+        
+        secrets = self._subtree(client, path)
+        if dry_run:
+            return {'success': True, 'dry_run': True, 'secrets': secrets, 'count': len(secrets)}
+        
+        def delete(secret_path):
+            mp, p = self._parse_path(secret_path)
+            client.secrets.kv.v2.delete_metadata_and_all_versions(path=p, mount_point=mp)
+        
+        job = self._start_tree_job('delete', name, secrets, delete, rate)
+        return {'success': True, 'job': job, 'message': f'Deleting {len(secrets)} secrets'}
+    
+    def move_tree(self, name: str, source_path: str, target_path: str,
+                  dry_run: bool = False, rate: float = TREE_OP_RATE) -> Dict:
+        """Move a secret or a whole folder, copying each secret before deleting it"""
+        client, error = self._connected_client(name)
+        if error:
+            return error
+        
+        if source_path.endswith('/') and not target_path.endswith('/'):
+            # A folder is moved into a folder, kv/new is read as kv/new/
+            target_path += '/'
+        src_mount, src_base = self._parse_path(source_path)
+        dst_mount, dst_base = self._parse_path(target_path)
+        if source_path.endswith('/') and src_mount == dst_mount and dst_base.startswith(src_base):
+            return {'success': False, 'message': 'Target is inside the source folder'}
+        
+        moves = []
+        for secret_path in self._subtree(client, source_path):
+            mp, p = self._parse_path(secret_path)
+            if source_path.endswith('/'):
+                moves.append((secret_path, f"{dst_mount}/{dst_base}{p[len(src_base):]}"))
+            elif target_path.endswith('/'):
+                moves.append((secret_path, f"{dst_mount}/{dst_base}{p.split('/')[-1]}"))
+            else:
+                moves.append((secret_path, f"{dst_mount}/{dst_base}"))
+        if dry_run:
+            return {
+                'success': True,
+                'dry_run': True,
+                'moves': [{'from': src, 'to': dst} for src, dst in moves],
+                'count': len(moves)
+            }
+        
+        def move(item):
+            src_mp, src_p = self._parse_path(item[0])
+            dst_mp, dst_p = self._parse_path(item[1])
+            response = client.secrets.kv.v2.read_secret_version(
+                path=src_p, mount_point=src_mp, raise_on_deleted_version=True
+            )
+            client.secrets.kv.v2.create_or_update_secret(
+                path=dst_p, mount_point=dst_mp, secret=response['data']['data']
+            )
+            client.secrets.kv.v2.delete_metadata_and_all_versions(path=src_p, mount_point=src_mp)
+        
+        job = self._start_tree_job('move', name, moves, move, rate)
+        return {'success': True, 'job': job, 'message': f'Moving {len(moves)} secrets'}
+    
+    def get_job(self, job_id: str) -> Dict:
+        """Progress of a background job"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return {'success': False, 'message': f'Job "{job_id}" not found'}
+        return {'success': True, 'job': job}
+    
+    def list_jobs(self) -> Dict:
+        """All known background jobs"""
+        return {'success': True, 'jobs': self.jobs.list()}
+    
     # ============ Sync Operations ============
     
     def sync_secrets(self, source_cluster: str, target_cluster: str,
@@ -442,24 +798,26 @@ class VaultManager:
             synced = []
             errors = []
             
-            if recursive and source_path.endswith('/'):
-                self._sync_recursive(
-                    src.client, dst.client,
-                    src_mount, src_path_clean,
-                    dst_mount, dst_path_clean,
-                    synced, errors
-                )
-            else:
-                result = self._sync_single(
-                    src.client, dst.client,
-                    src_mount, src_path_clean,
-                    dst_mount, dst_path_clean
-                )
-                if result['success']:
-                    synced.append(result['path'])
+            with tracer.span('sync', source=f"{source_cluster}/{source_path}", target=f"{target_cluster}/{target_path}"):
+                if recursive and source_path.endswith('/'):
+                    self._sync_recursive(
+                        src.client, dst.client,
+                        src_mount, src_path_clean,
+                        dst_mount, dst_path_clean,
+                        synced, errors
+                    )
                 else:
-                    errors.append(result)
+                    result = self._sync_single(
+                        src.client, dst.client,
+                        src_mount, src_path_clean,
+                        dst_mount, dst_path_clean
+                    )
+                    if result['success']:
+                        synced.append(result['path'])
+                    else:
+                        errors.append(result)
             
+            self._invalidate_cache(target_cluster)
             return {
                 'success': len(errors) == 0,
                 'synced': synced,
@@ -467,6 +825,7 @@ class VaultManager:
                 'message': f'Synced {len(synced)} secrets, {len(errors)} errors'
             }
         except Exception as e:
+            self._invalidate_cache(target_cluster)
             return {'success': False, 'message': str(e)}
     
     def _parse_path(self, full_path: str) -> tuple:
@@ -514,14 +873,15 @@ class VaultManager:
                      dst_mount, dst_path) -> Dict:
         """Sync a single secret"""
         try:
-            response = src_client.secrets.kv.v2.read_secret_version(
-                mount_point=src_mount, path=src_path, raise_on_deleted_version=True
-            )
-            data = response['data']['data']
-            
-            dst_client.secrets.kv.v2.create_or_update_secret(
-                mount_point=dst_mount, path=dst_path, secret=data
-            )
+            with tracer.span('copy', path=f'{src_mount}/{src_path}'):
+                response = src_client.secrets.kv.v2.read_secret_version(
+                    mount_point=src_mount, path=src_path, raise_on_deleted_version=True
+                )
+                data = response['data']['data']
+                
+                dst_client.secrets.kv.v2.create_or_update_secret(
+                    mount_point=dst_mount, path=dst_path, secret=data
+                )
             return {'success': True, 'path': f'{dst_mount}/{dst_path}'}
         except hvac.exceptions.InvalidPath:
             return {'success': False, 'path': f'{src_mount}/{src_path}', 'error': 'Not found'}
@@ -534,33 +894,36 @@ class VaultManager:
             return {'success': False, 'message': f'Cluster "{source_cluster}" not found'}
         
         src_mount, src_path_clean = self._parse_path(source_path)
-        secrets = self._list_recursive(
-            self.clusters[source_cluster].client, src_mount, src_path_clean
+        store = PathStore()
+        self._walk_secrets(
+            self.clusters[source_cluster].client, src_mount, src_path_clean, store
         )
-        return {'success': True, 'secrets': secrets, 'count': len(secrets)}
+        return {'success': True, 'secrets': list(store), 'count': len(store)}
     
     # ============ Export/Import ============
     
     def export_secrets(self, name: str, mount_point: Optional[str] = None,
                        path: str = '') -> Dict:
         """Export secrets as JSON"""
-        secrets_list = self.list_secrets(name, mount_point, path)
+        with tracer.span('walk', cluster=name):
+            secrets_list = self.list_secrets(name, mount_point, path)
         if not secrets_list['success']:
             return secrets_list
         
-        cluster = self.clusters[name]
-        exported = []
-        
-        for secret_path in secrets_list['secrets']:
-            parts = secret_path.split('/', 1)
-            if len(parts) >= 2:
-                mp, p = parts[0], parts[1]
-                result = self.read_secret(name, mp, p)
-                if result['success']:
-                    exported.append({
-                        'path': secret_path,
-                        'data': result['data']
-                    })
+        client, error = self._connected_client(name)
+        if error:
+            return error
+        
+        def read(secret_path):
+            mp, p = self._parse_path(secret_path)
+            with tracer.span('read', path=secret_path):
+                return secret_path, self._read(client, mp, p) if p else {'success': False}
+        
+        exported = [
+            {'path': secret_path, 'data': result['data']}
+            for secret_path, result in self._run_batch(read, secrets_list['secrets'])
+            if result['success']
+        ]
         
         return {
             'success': True,
@@ -571,13 +934,11 @@ class VaultManager:
     def import_secrets(self, name: str, secrets: List[Dict],
                        mount_point: Optional[str] = None) -> Dict:
         """Import secrets from JSON"""
-        if name not in self.clusters:
-            return {'success': False, 'message': f'Cluster "{name}" not found'}
+        client, error = self._connected_client(name)
+        if error:
+            return error
         
-        imported = []
-        errors = []
-        
-        for secret in secrets:
+        def write(secret):
             path = secret.get('path', '')
             data = secret.get('data', {})
             
@@ -589,14 +950,18 @@ class VaultManager:
                 if len(parts) >= 2:
                     mp, p = parts[0], parts[1]
                 else:
-                    errors.append({'path': path, 'error': 'Invalid path format'})
-                    continue
+                    return path, {'success': False, 'message': 'Invalid path format'}
             
-            result = self.write_secret(name, mp, p, data)
+            return path, self._write(client, mp, p, data)
+        
+        imported = []
+        errors = []
+        for path, result in self._run_batch(write, secrets):
             if result['success']:
                 imported.append(path)
             else:
                 errors.append({'path': path, 'error': result['message']})
+        self._invalidate_cache(name)
         
         return {
             'success': len(errors) == 0,
@@ -615,7 +980,8 @@ class VaultManager:
                     name: {
                         'url': c.url,
                         'token': c.token,
-                        'description': c.description
+                        'description': c.description,
+                        'timeout': c.timeout
                     }
                     for name, c in self.clusters.items()
                 }
@@ -626,30 +992,85 @@ class VaultManager:
         except Exception as e:
             return {'success': False, 'message': str(e)}
     
-    def load_config(self) -> Dict:
-        """Load configuration from file"""
+    def load_config(self, warm: bool = True, seed_only: bool = False) -> Dict:
+        """Load configuration from file, connecting all clusters concurrently
+        
+        With seed_only, as each worker does when it starts, the file is only read while the
+        shared registry is empty, so clusters added through the API survive worker restarts.
+        """
         try:
+            self.refresh_registry(force=True)
+            if seed_only and self.clusters:
+                if warm:
+                    self.warm_cache(list(self.clusters))
+                return {
+                    'success': True,
+                    'message': f'Using {len(self.clusters)} clusters from the shared registry',
+                    'clusters': list(self.clusters),
+                    'failed': {},
+                    'removed': []
+                }
             if not os.path.exists(CONFIG_FILE):
                 return {'success': False, 'message': 'Configuration file not found'}
             
             with open(CONFIG_FILE, 'r') as f:
                 config = yaml.safe_load(f)
             
+            # The file wins over the registry: clusters it no longer lists are dropped and
+            # changed ones reconnected, unchanged ones are left to connect on first use
+            clusters = config.get('clusters') or {}
+            removed = [name for name in self.clusters if name not in clusters]
+            for name in removed:
+                self.clusters.pop(name).disconnect()
+                self._registry_changed(self.store.remove_cluster(name))
+                self._invalidate_cache(name, mounts=True)
+            
+            def settings(data):
+                return (data['url'].rstrip('/'), data['token'],
+                        data.get('description', ''), data.get('timeout', CONNECT_TIMEOUT))
+            
+            pending = {
+                name: data for name, data in clusters.items()
+                if name not in self.clusters or settings(data) != (
+                    self.clusters[name].url, self.clusters[name].token,
+                    self.clusters[name].description, self.clusters[name].timeout)
+            }
+            
+            def connect(item):
+                name, data = item
+                url, token, description, timeout = settings(data)
+                cluster = VaultCluster(name=name, url=url, token=token,
+                                       description=description, timeout=timeout)
+                cluster.connect()
+                return cluster
+            
             loaded = []
-            for name, data in config.get('clusters', {}).items():
-                result = self.add_cluster(
-                    name=name,
-                    url=data['url'],
-                    token=data['token'],
-                    description=data.get('description', '')
-                )
-                if result['success']:
-                    loaded.append(name)
+            failed = {}
+            with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, max(len(pending), 1))) as executor:
+                for cluster in executor.map(connect, pending.items()):
+                    previous = self.clusters.get(cluster.name)
+                    if previous is not None:
+                        previous.disconnect()
+                        self._invalidate_cache(cluster.name, mounts=True)
+                    # Registered either way, a failed cluster is retried on first use
+                    self.clusters[cluster.name] = cluster
+                    self._save_cluster(cluster)
+                    if cluster.connected:
+                        loaded.append(cluster.name)
+                    else:
+                        failed[cluster.name] = cluster.error
+            
+            if warm and self.clusters:
+                # Also clusters other workers registered, their cache may already be warm
+                self.warm_cache(list(self.clusters))
             
             return {
                 'success': True,
-                'message': f'Loaded {len(loaded)} clusters',
-                'clusters': loaded
+                'message': f'Loaded {len(loaded)} clusters' + (f', {len(failed)} failed' if failed else '')
+                           + (f', removed {len(removed)}' if removed else ''),
+                'clusters': loaded,
+                'failed': failed,
+                'removed': removed
             }
         except Exception as e:
             return {'success': False, 'message': str(e)}
\ No newline at end of file
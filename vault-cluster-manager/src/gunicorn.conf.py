@@ -0,0 +1,9 @@
+import os
+
+# Production serving: gunicorn --config gunicorn.conf.py (from this directory)
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('VAULT_GUI_BIND', '0.0.0.0:5555')
+workers = int(os.environ.get('VAULT_GUI_WORKERS', 4))
+worker_class = 'eventlet'
+worker_connections = 100
+timeout = 120
@@ -4,6 +4,24 @@ let currentSecret = null;
 let secretsData = {};
 let mountPoints = [];
 
+// Secrets tree state: only the rows inside the viewport are turned into DOM nodes
+const TREE_ROW_HEIGHT = 28;
+const TREE_OVERSCAN = 10;
+const FILTER_DEBOUNCE_MS = 150;
+
+let treeRoots = [];            // [{name, path, isSecret, depth, parent, children}]
+let treePaths = [];            // secret paths in tree order, shared with the filter worker
+let treeSecretNodes = [];      // node of each entry in treePaths
+let treeRows = [];             // nodes currently scrollable (expanded or filtered)
+let expandedFolders = new Set();
+let selectedSecretPath = null;
+let filterQuery = '';
+let filterMatches = null;      // Int32Array of treePaths indices while a filter is active
+let filterWorker = null;
+let filterRequestId = 0;
+let filterTimer = null;
+let treeRenderPending = false;
+
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
     loadClusters();
@@ -14,8 +32,18 @@ document.addEventListener('DOMContentLoaded', () => {
 function setupEventListeners() {
     // Filter secrets
     document.getElementById('secretsFilter').addEventListener('input', (e) => {
-        filterSecrets(e.target.value);
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(() => filterSecrets(e.target.value), FILTER_DEBOUNCE_MS);
     });
+    
+    // Tree rows are rendered on scroll and clicked through delegation
+    document.querySelector('.secrets-tree-container').addEventListener('scroll', scheduleTreeRender);
+    document.getElementById('secretsTree').addEventListener('click', onTreeClick);
+    
+    if (window.Worker) {
+        filterWorker = new Worker('/static/js/filter-worker.js');
+        filterWorker.onmessage = onFilterResult;
+    }
 
     // Import file handler
     document.getElementById('importFile').addEventListener('change', (e) => {
@@ -32,9 +60,11 @@ function setupEventListeners() {
 
 // ============ API Helpers ============
 
-async function apiCall(endpoint, method = 'GET', data = null) {
+async function apiCall(endpoint, method = 'GET', data = null, cache = 'default') {
+    // GET views carry an ETag: 'default' revalidates them, 'reload' forces a fresh copy
     const options = {
         method,
+        cache,
         headers: { 'Content-Type': 'application/json' }
     };
     if (data) {
@@ -159,6 +189,7 @@ async function deleteCluster(name) {
             currentCluster = null;
             document.getElementById('clusterInfoBar').classList.add('d-none');
             document.getElementById('secretsTree').innerHTML = '';
+            treeRows = [];
         }
         loadClusters();
     } else {
@@ -218,22 +249,45 @@ async function selectCluster(name) {
     infoBar.classList.remove('d-none');
     document.getElementById('currentClusterName').textContent = name;
     
-    // Load cluster data
-    await loadMountPoints();
-    await loadSecretsTree();
-    
-    // Get cluster status
-    const status = await apiCall(`/clusters/${name}/status`);
-    if (status.success) {
-        document.getElementById('currentClusterUrl').textContent = ` - ${status.cluster.url}`;
-        const badge = document.getElementById('clusterStatus');
-        if (status.cluster.connected) {
-            badge.className = 'badge bg-success';
-            badge.textContent = 'Connected';
-        } else {
-            badge.className = 'badge bg-danger';
-            badge.textContent = 'Disconnected';
-        }
+    expandedFolders = new Set();
+    selectedSecretPath = null;
+    document.querySelector('.secrets-tree-container').scrollTop = 0;
+    
+    const container = document.getElementById('secretsTree');
+    container.innerHTML = '<div class="text-center p-3"><div class="spinner-border spinner-border-sm"></div> Loading...</div>';
+    
+    // Status, mounts and the first tree level arrive in one round-trip
+    const overview = await apiCall(`/clusters/${name}/overview`);
+    if (currentCluster !== name) return;
+    
+    if (!overview.success) {
+        container.innerHTML = `<div class="text-danger p-3">${overview.message}</div>`;
+        renderClusterStatus(null);
+        return;
+    }
+    
+    renderClusterStatus(overview.cluster);
+    mountPoints = overview.mounts;
+    renderMountsTable(overview.mounts);
+    updateMountDropdowns(overview.mounts);
+    secretsData = overview.tree;
+    renderSecretsTree(overview.tree);
+    
+    // Fill in the rest of the tree in the background
+    loadSecretsTree(null, false);
+}
+
+function renderClusterStatus(cluster) {
+    const badge = document.getElementById('clusterStatus');
+    if (cluster) {
+        document.getElementById('currentClusterUrl').textContent = ` - ${cluster.url}`;
+    }
+    if (cluster && cluster.connected) {
+        badge.className = 'badge bg-success';
+        badge.textContent = 'Connected';
+    } else {
+        badge.className = 'badge bg-danger';
+        badge.textContent = 'Disconnected';
     }
 }
 
@@ -282,13 +336,17 @@ async function browseMountPoint(path) {
 
 // ============ Secrets Tree ============
 
-async function loadSecretsTree(mountPoint = null) {
+async function loadSecretsTree(mountPoint = null, showSpinner = true, cache = 'default') {
     if (!currentCluster) return;
     
+    const cluster = currentCluster;
     const container = document.getElementById('secretsTree');
-    container.innerHTML = '<div class="text-center p-3"><div class="spinner-border spinner-border-sm"></div> Loading...</div>';
+    if (showSpinner) {
+        container.innerHTML = '<div class="text-center p-3"><div class="spinner-border spinner-border-sm"></div> Loading...</div>';
+    }
     
-    const result = await apiCall(`/clusters/${currentCluster}/secrets/tree`);
+    const result = await apiCall(`/clusters/${cluster}/secrets/tree`, 'GET', null, cache);
+    if (currentCluster !== cluster) return;
     
     if (result.success) {
         secretsData = result.tree;
@@ -299,84 +357,188 @@ async function loadSecretsTree(mountPoint = null) {
 }
 
 function renderSecretsTree(tree) {
+    buildTreeIndex(tree);
+    if (filterWorker) {
+        filterWorker.postMessage({ type: 'load', paths: treePaths });
+    }
     const container = document.getElementById('secretsTree');
-    container.innerHTML = buildTreeHTML(tree, '');
+    container.innerHTML = '<div class="tree-viewport"><div class="tree-window"></div></div>';
+    if (filterQuery) {
+        filterSecrets(filterQuery);
+    } else {
+        refreshTreeRows();
+    }
+}
+
+function buildTreeIndex(tree) {
+    // Turn the API tree into linked nodes plus a flat list of secret paths in display order
+    treeRoots = [];
+    treePaths = [];
+    treeSecretNodes = [];
+    
+    function build(node, path, depth, parent) {
+        const children = [];
+        for (const [key, value] of Object.entries(node)) {
+            if (key === '_is_secret' || key === '_path') continue;
+            
+            const fullPath = path ? `${path}/${key}` : key;
+            if (value._is_secret === true) {
+                const secretNode = { name: key, path: value._path, isSecret: true, depth, parent };
+                treePaths.push(value._path);
+                treeSecretNodes.push(secretNode);
+                children.push(secretNode);
+            } else {
+                const folderNode = { name: key, path: fullPath, isSecret: false, depth, parent, children: null };
+                folderNode.children = build(value, fullPath, depth + 1, folderNode);
+                children.push(folderNode);
+            }
+        }
+        return children;
+    }
+    
+    treeRoots = build(tree, '', 0, null);
 }
 
-function buildTreeHTML(node, path) {
-    let html = '';
+function refreshTreeRows() {
+    treeRows = [];
+    if (filterMatches) {
+        // Matching secrets with their ancestor folders, always shown expanded
+        const emitted = new Set();
+        for (const index of filterMatches) {
+            const node = treeSecretNodes[index];
+            const ancestors = [];
+            for (let folder = node.parent; folder && !emitted.has(folder); folder = folder.parent) {
+                ancestors.push(folder);
+                emitted.add(folder);
+            }
+            for (let i = ancestors.length - 1; i >= 0; i--) {
+                treeRows.push(ancestors[i]);
+            }
+            treeRows.push(node);
+        }
+    } else {
+        const walk = (nodes) => {
+            for (const node of nodes) {
+                treeRows.push(node);
+                if (!node.isSecret && expandedFolders.has(node.path)) {
+                    walk(node.children);
+                }
+            }
+        };
+        walk(treeRoots);
+    }
+    renderTreeWindow();
+}
+
+function scheduleTreeRender() {
+    if (treeRenderPending) return;
+    treeRenderPending = true;
+    requestAnimationFrame(() => {
+        treeRenderPending = false;
+        renderTreeWindow();
+    });
+}
+
+function renderTreeWindow() {
+    const viewport = document.querySelector('#secretsTree .tree-viewport');
+    if (!viewport) return;
     
-    for (const [key, value] of Object.entries(node)) {
-        if (key === '_is_secret' || key === '_path') continue;
-        
-        const fullPath = path ? `${path}/${key}` : key;
-        const isSecret = value._is_secret === true;
-        
-        if (isSecret) {
+    if (treeRows.length === 0) {
+        viewport.style.height = 'auto';
+        viewport.firstElementChild.style.transform = '';
+        viewport.firstElementChild.innerHTML = `<p class="text-muted p-2">${filterQuery ? 'No matching secrets' : 'No secrets'}</p>`;
+        return;
+    }
+    
+    const scroller = document.querySelector('.secrets-tree-container');
+    const first = Math.max(0, Math.floor(scroller.scrollTop / TREE_ROW_HEIGHT) - TREE_OVERSCAN);
+    const last = Math.min(treeRows.length, Math.ceil((scroller.scrollTop + scroller.clientHeight) / TREE_ROW_HEIGHT) + TREE_OVERSCAN);
+    
+    let html = '';
+    for (let i = first; i < last; i++) {
+        const node = treeRows[i];
+        const indent = `padding-left: ${8 + node.depth * 20}px`;
+        if (node.isSecret) {
+            const selected = node.path === selectedSecretPath ? ' selected' : '';
             html += `
-                <div class="tree-node secret" onclick="loadSecret('${value._path}')" data-path="${value._path}">
+                <div class="tree-node tree-row secret${selected}" data-index="${i}" style="${indent}">
                     <i class="bi bi-key node-icon"></i>
-                    <span>${key}</span>
+                    <span>${escapeHtml(node.name)}</span>
                 </div>
             `;
         } else {
-            const childrenHTML = buildTreeHTML(value, fullPath);
+            const open = filterMatches || expandedFolders.has(node.path);
             html += `
-                <div class="tree-folder">
-                    <div class="tree-node folder" onclick="toggleFolder(this)">
-                        <span class="tree-toggle"><i class="bi bi-chevron-right"></i></span>
-                        <i class="bi bi-folder node-icon"></i>
-                        <span>${key}</span>
-                    </div>
-                    <div class="tree-children" style="display: none;">
-                        ${childrenHTML}
-                    </div>
+                <div class="tree-node tree-row folder" data-index="${i}" style="${indent}">
+                    <span class="tree-toggle"><i class="bi ${open ? 'bi-chevron-down' : 'bi-chevron-right'}"></i></span>
+                    <i class="bi bi-folder node-icon"></i>
+                    <span>${escapeHtml(node.name)}</span>
                 </div>
             `;
         }
     }
     
-    return html;
+    viewport.style.height = `${treeRows.length * TREE_ROW_HEIGHT}px`;
+    viewport.firstElementChild.style.transform = `translateY(${first * TREE_ROW_HEIGHT}px)`;
+    viewport.firstElementChild.innerHTML = html;
 }
 
-function toggleFolder(element) {
-    const children = element.nextElementSibling;
-    const toggle = element.querySelector('.tree-toggle i');
+function onTreeClick(event) {
+    const row = event.target.closest('.tree-row');
+    if (!row) return;
+    
+    const node = treeRows[Number(row.dataset.index)];
+    if (!node) return;
     
-    if (children.style.display === 'none') {
-        children.style.display = 'block';
-        toggle.className = 'bi bi-chevron-down';
+    if (node.isSecret) {
+        loadSecret(node.path);
+    } else if (!filterMatches) {
+        toggleFolder(node.path);
+    }
+}
+
+function toggleFolder(path) {
+    if (expandedFolders.has(path)) {
+        expandedFolders.delete(path);
     } else {
-        children.style.display = 'none';
-        toggle.className = 'bi bi-chevron-right';
+        expandedFolders.add(path);
     }
+    refreshTreeRows();
 }
 
 function filterSecrets(query) {
-    const nodes = document.querySelectorAll('.tree-node');
-    query = query.toLowerCase();
+    filterQuery = query.trim();
+    const requestId = ++filterRequestId;
     
-    nodes.forEach(node => {
-        const text = node.textContent.toLowerCase();
-        const parent = node.closest('.tree-folder');
-        
-        if (query === '' || text.includes(query)) {
-            node.style.display = 'flex';
-            if (parent) {
-                parent.style.display = 'block';
-                const children = parent.querySelector('.tree-children');
-                if (children && query !== '') {
-                    children.style.display = 'block';
-                    const toggle = parent.querySelector('.tree-toggle i');
-                    if (toggle) toggle.className = 'bi bi-chevron-down';
-                }
-            }
-        } else {
-            if (node.classList.contains('secret')) {
-                node.style.display = 'none';
-            }
-        }
+    if (filterQuery === '') {
+        filterMatches = null;
+        refreshTreeRows();
+        return;
+    }
+    
+    if (filterWorker) {
+        filterWorker.postMessage({ type: 'filter', id: requestId, query: filterQuery });
+        return;
+    }
+    
+    // No worker support: filter on the main thread
+    const lowerQuery = filterQuery.toLowerCase();
+    const matches = [];
+    treePaths.forEach((p, i) => {
+        if (p.toLowerCase().includes(lowerQuery)) matches.push(i);
     });
+    filterMatches = Int32Array.from(matches);
+    refreshTreeRows();
+}
+
+function onFilterResult(event) {
+    const message = event.data;
+    // Ignore answers to queries the user already typed past
+    if (message.type !== 'result' || message.id !== filterRequestId) return;
+    
+    filterMatches = message.indices;
+    document.querySelector('.secrets-tree-container').scrollTop = 0;
+    refreshTreeRows();
 }
 
 // ============ Secret Operations ============
@@ -385,9 +547,8 @@ async function loadSecret(path) {
     if (!currentCluster) return;
     
     // Update selection
-    document.querySelectorAll('.tree-node').forEach(n => n.classList.remove('selected'));
-    const node = document.querySelector(`.tree-node[data-path="${path}"]`);
-    if (node) node.classList.add('selected');
+    selectedSecretPath = path;
+    renderTreeWindow();
     
     const parts = path.split('/');
     const mountPoint = parts[0];
@@ -548,7 +709,8 @@ async function createSecret() {
 }
 
 function refreshSecrets() {
-    loadSecretsTree();
+    // Refresh also picks up changes made outside the GUI, skip the cached copy
+    loadSecretsTree(null, true, 'reload');
     loadMountPoints();
 }
 
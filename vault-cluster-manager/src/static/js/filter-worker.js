@@ -0,0 +1,26 @@
+// Filters the flat list of secret paths off the main thread.
+// Messages: {type: 'load', paths} and {type: 'filter', id, query};
+// replies {type: 'result', id, indices} with the matching path indices in order.
+
+let lowerPaths = [];
+
+self.onmessage = (event) => {
+    const message = event.data;
+    
+    if (message.type === 'load') {
+        lowerPaths = message.paths.map(p => p.toLowerCase());
+        return;
+    }
+    
+    if (message.type === 'filter') {
+        const query = message.query.toLowerCase();
+        const matches = [];
+        for (let i = 0; i < lowerPaths.length; i++) {
+            if (lowerPaths[i].includes(query)) {
+                matches.push(i);
+            }
+        }
+        const indices = Int32Array.from(matches);
+        self.postMessage({ type: 'result', id: message.id, indices }, [indices.buffer]);
+    }
+};
@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# All workers share clusters, cached catalogs and jobs through this database
+os.environ.setdefault(
+    'VAULT_GUI_STATE_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'state.db')
+)
+
+from app import app
+from api.routes import vault_manager
+
+# The first worker seeds the shared registry from clusters.yaml, later ones (and restarts)
+# keep what the registry holds; POST /api/config/load reconciles with the file on request
+vault_manager.load_config(seed_only=True)
@@ -1,17 +1,20 @@
-import requests
 import glob
 import argparse
+import contextlib
 import os
 import sys
 import json
-import yaml
-import hvac 
+import hashlib
+import fnmatch
 import re
 
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+# hvac, requests and yaml are imported on first use, see import_vault_modules / read_yaml
+hvac = None
+requests = None
+yaml = None
 
 main_config_file = "vars/default.yaml"
+cache_dir = os.environ.get("VAULT_TOOL_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".vault_cache"))
 
 client = ""
 client_src = ""
@@ -31,6 +34,9 @@ jobs = ""
 
 final_structure = {}
 
+# Set by --trace, see start_tracer
+tracer = None
+
 def client(args,inventory=None,method=None,source=None,target=None):
 	global client
 	global client_src
@@ -47,37 +53,26 @@ def client(args,inventory=None,method=None,source=None,target=None):
 	global sync_file
 
 	global jobs
+	import_vault_modules()
 	if inventory != None:
 		file_check(inventory)
 	clusters = list(final_structure.get("vault_cfg",{}).get("clusters",{}).keys())
 	secrets = final_structure.get("vault_cfg",{}).get("secrets") 
 	for sec in secrets:
 		file_check(sec)	
-		with open(sec) as f:
-			data = yaml.safe_load(f) or {}
-			secrets = merge(secrets,data)
+		# Token files are read each run, they are never written to the cache
+		data = read_yaml(sec) or {}
+		secrets = merge(secrets,data)
 	if method == None:
 		if args.src not in clusters:
 			print(f"{args.src} not in inventory")
 			exit(1)
-		url = final_structure.get("vault_cfg",{}).get("clusters",{}).get(args.src,{}).get("url")
-		token = final_structure.get("vault_cfg",{}).get("clusters",{}).get(args.src,{}).get("token")
-		if  not url or not token:
-			print("No Token / Url Provided")
-			sys.exit(1)	
-		client = hvac.Client(url=url, token=token,verify=False)
+		client = cluster_client(args.src)
 		response = client.sys.list_mounted_secrets_engines()['data']
 		mount_point = (sorted(response.keys()))
 	else:
-		token_client = final_structure.get("vault_cfg",{}).get("clusters",{}).get(source,{}).get("token") 
-		token_target = final_structure.get("vault_cfg",{}).get("clusters",{}).get(target,{}).get("token") 
-		url_client = final_structure.get("vault_cfg",{}).get("clusters",{}).get(source,{}).get("url") 
-		url_target = final_structure.get("vault_cfg",{}).get("clusters",{}).get(target,{}).get("url") 
-		if  not url_client or not token_client or not token_target or not url_target:
-			print("No Token / Url Provided")
-			sys.exit(1)	
-		client_src = hvac.Client(url=url_client, token=token_client,verify=False)
-		client_dst = hvac.Client(url=url_target, token=token_target,verify=False)
+		client_src = cluster_client(source)
+		client_dst = cluster_client(target)
 
 		# No anymore differences between master and normal cluster
 		try:
@@ -94,8 +89,148 @@ def client(args,inventory=None,method=None,source=None,target=None):
 			print(f"Permission denied while getting secrets engines for {target} ")
 			mount_point_dst = [target]
 
-		
-def list_all_recursive(client,path='',mount_point=''):
+
+def load_core_module(name):
+	# Standard-library-only modules of the GUI's core package are shared with the CLI. They are
+	# loaded by file path, so neither side has to put the other on sys.path
+	import importlib.util
+	module_name = f"vault_core_{name}"
+	if module_name not in sys.modules:
+		spec = importlib.util.spec_from_file_location(module_name, os.path.join(os.path.dirname(os.path.abspath(__file__)), "vault-cluster-manager", "src", "core", f"{name}.py"))
+		module = importlib.util.module_from_spec(spec)
+		sys.modules[module_name] = module
+		spec.loader.exec_module(module)
+	return sys.modules[module_name]
+
+def import_vault_modules():
+	global hvac
+	global requests
+	if hvac != None:
+		return
+	import requests
+	import hvac
+	from requests.packages.urllib3.exceptions import InsecureRequestWarning
+	requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+	if tracer != None:
+		trace_vault_calls()
+
+def read_yaml(file):
+	global yaml
+	if yaml == None:
+		import yaml
+	loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+	with open(file) as f:
+		return yaml.load(f, Loader=loader)
+
+def file_signature(files):
+	signature = []
+	for file in files:
+		st = os.stat(file)
+		signature.append((os.path.abspath(file), st.st_mtime_ns, st.st_size))
+	return signature
+
+def state_load(name, default=None):
+	# State files hold tokens and decide what is written to Vault, only our own private files are trusted
+	try:
+		with open(os.path.join(cache_dir, f"{name}.json")) as f:
+			st = os.fstat(f.fileno())
+			if st.st_uid != os.getuid() or st.st_mode & 0o077:
+				print(f"Ignoring {f.name}: not a private file of the current user", file=sys.stderr)
+				return default
+			return json.load(f)
+	except (OSError, ValueError):
+		return default
+
+def state_save(name, data):
+	try:
+		payload = json.dumps(data)
+	except (TypeError, ValueError):
+		# yaml values JSON can't hold (dates, sets), such data is not cached
+		return
+	try:
+		os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+		tmp_file = os.path.join(cache_dir, f"{name}.json.{os.getpid()}")
+		if os.path.lexists(tmp_file):
+			os.unlink(tmp_file)
+		with os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+			f.write(payload)
+		os.replace(tmp_file, os.path.join(cache_dir, f"{name}.json"))
+	except OSError:
+		pass
+
+def cache_get(name):
+	# Entries are only returned while every source file still has the recorded mtime and size
+	entry = state_load(name)
+	try:
+		for path, mtime, size in entry["signature"]:
+			st = os.stat(path)
+			if st.st_mtime_ns != mtime or st.st_size != size:
+				return None
+		return entry
+	except (OSError, TypeError, KeyError, ValueError):
+		return None
+
+def cache_put(name, files, data):
+	try:
+		state_save(name, {"signature": file_signature(files), "data": data})
+	except OSError:
+		pass
+
+def cluster_names_cached(file):
+	# Only the cluster names are cached, the file usually holds the tokens as well
+	name = re.sub(r'[^A-Za-z0-9_.-]', '_', os.path.abspath(file))
+	entry = cache_get(f"nodes-{name}")
+	if entry != None:
+		return entry["data"]
+	# Earlier versions cached the whole parsed file
+	with contextlib.suppress(OSError):
+		os.remove(os.path.join(cache_dir, f"yaml-{name}.json"))
+	names = list(((read_yaml(file) or {}).get("vault_cfg") or {}).get("clusters") or {})
+	cache_put(f"nodes-{name}", [file], names)
+	return names
+
+def cluster_tokens(structure):
+	# {cluster: token} of the clusters a parsed config file gives a token
+	clusters = ((structure or {}).get("vault_cfg") or {}).get("clusters") or {}
+	return {name: cluster["token"] for name, cluster in clusters.items() if isinstance(cluster, dict) and "token" in cluster}
+
+def compile_path_filter(include=None,exclude=None):
+	# Patterns are globs on "mount/path" ('*' also matches '/'), or regexes when prefixed with "re:"
+	def compile_patterns(patterns):
+		compiled = []
+		for pattern in ([patterns] if isinstance(patterns, str) else patterns or []):
+			if pattern.startswith("re:"):
+				compiled.append((re.compile(pattern[3:]).search, None))
+			else:
+				pattern = pattern.lstrip('/')
+				literal_prefix = re.split(r'[*?\[]', pattern, 1)[0]
+				compiled.append((re.compile(fnmatch.translate(pattern)).match, literal_prefix))
+		return compiled
+	if not include and not exclude:
+		return None
+	return {"include": compile_patterns(include), "exclude": compile_patterns(exclude)}
+
+def path_allowed(path_filter,path):
+	# Folders end with '/': an excluded folder is never listed, and with include patterns a
+	# folder is only listed when it can still contain a match
+	if path_filter == None:
+		return True
+	path = path.lstrip('/')
+	is_folder = path.endswith('/')
+	for match, literal_prefix in path_filter["exclude"]:
+		if match(path) or (is_folder and match(path.rstrip('/'))):
+			return False
+	if not path_filter["include"]:
+		return True
+	for match, literal_prefix in path_filter["include"]:
+		if is_folder:
+			if literal_prefix == None or literal_prefix.startswith(path) or path.startswith(literal_prefix):
+				return True
+		elif match(path):
+			return True
+	return False
+
+def list_all_recursive(client,path='',mount_point='',path_filter=None):
 	secrets_found = []
 	try:
 		response = client.secrets.kv.v2.list_secrets(path=path, mount_point=mount_point)
@@ -105,9 +240,11 @@ def list_all_recursive(client,path='',mount_point=''):
 
 
 	for key in keys:
+		if not path_allowed(path_filter, f"{mount_point}/{path}{key}"):
+			continue
 		if key.endswith('/'):
 			sub_path = f"{path}{key}" if path else key
-			secrets_found.extend(list_all_recursive(client,sub_path, mount_point))
+			secrets_found.extend(list_all_recursive(client,sub_path, mount_point, path_filter))
 		else:
 			full_path = f"/{mount_point}/{path}{key}" if path else f"/{mount_point}/{key}" 
 			secrets_found.append(full_path)
@@ -117,16 +254,19 @@ def list_keys(args):
 	global client
 	global mount_point
 	secrets = []
+	path_filter = compile_path_filter(getattr(args,'include',None),getattr(args,'exclude',None))
 	if not getattr(args,'cluster',None):
 		for mp in mount_point:
-			all_secrets = list_all_recursive(client,mount_point=mp.replace('/',''))
+			if not path_allowed(path_filter, mp):
+				continue
+			all_secrets = list_all_recursive(client,mount_point=mp.replace('/',''),path_filter=path_filter)
 			secrets += all_secrets
 	else:
 		if args.cluster in [s.replace('/','') for s in mount_point]:
 			if args.src != 'master':
-				all_secrets = list_all_recursive(client,mount_point="master")
+				all_secrets = list_all_recursive(client,mount_point="master",path_filter=path_filter)
 			else:
-				all_secrets = list_all_recursive(client,mount_point=args.cluster)
+				all_secrets = list_all_recursive(client,mount_point=args.cluster,path_filter=path_filter)
 			secrets += all_secrets
 		else:
 			print("Cluster not found")
@@ -157,6 +297,7 @@ def file_check(file):
 		sys.exit(1)
 
 def make_structure(secrets,dir=None,src=None):
+	files = {}
 	for entry in secrets:
 		base_directory = entry["key"]
 		split = base_directory.split('/')
@@ -164,21 +305,21 @@ def make_structure(secrets,dir=None,src=None):
 			mount_point = split[1] 
 			namespace = split[2]
 			secret_name = split[3]
-			new_path = f"/{mount_point}/ns/{namespace}/secret/{secret_name}"
+			new_path = f"{mount_point}/ns/{namespace}/secret/{secret_name}"
 			for filename,content in entry["data"].items():
 				if dir != None:
-					full_path = os.path.join(f"{dir}{src}{new_path}",filename)
-					os.makedirs(f"{dir}{src}{new_path}",exist_ok=True)
-					with open(full_path, "w") as f:
-						f.write(content)
-					print(os.path.abspath(full_path))
+					files[os.path.join(new_path,filename)] = content
 				else:
-					print(new_path)
+					print(f"/{new_path}")
+	if dir != None:
+		write_structure(files, f"{dir}{src}")
 
 def handle_list(args):
 	client(args)
-	secrets_keys = list_keys(args)
-	secrets = list_secrets(secrets_keys)
+	with trace_span("walk"):
+		secrets_keys = list_keys(args)
+	with trace_span("read", count=len(secrets_keys)):
+		secrets = list_secrets(secrets_keys)
 	if not args.dir and not args.inline:
 		json_string = '\n'.join(json.dumps(item) for item in secrets)
 		print(json_string)
@@ -186,33 +327,167 @@ def handle_list(args):
 		make_structure(secrets)	
 
 def handle_backup(args):
-	client(args)
-	secrets_keys = list_keys(args)
-	secrets = list_secrets(secrets_keys)
 	if os.path.isdir(args.dir) == False:
 		print("Dir doesn't exists, please create it")
 		sys.exit(1)
-	make_structure(secrets,args.dir,args.src)
+	if args.keep != None and args.keep < 1:
+		print("--keep must be at least 1")
+		sys.exit(1)
+	if args.gc:
+		lock = lock_backup_store(backup_store_dir(args))
+		gc_backup_store(backup_store_dir(args), args.keep)
+		lock.close()
+		return
+	key = load_backup_key(args.encrypt_key_file) if args.encrypt_key_file else None
+	if args.from_archive:
+		make_structure(read_backup_archive(args.from_archive, key),args.dir,args.src)
+		return
+	if args.from_manifest:
+		store, name = backup_store_dir(args), args.from_manifest
+		if os.path.isfile(name):
+			# A manifest file given by path names its own store, so it can be restored under another --dir
+			store, name = os.path.dirname(os.path.dirname(os.path.abspath(name))), os.path.basename(name)
+		make_structure(read_backup_store(store, name),args.dir,args.src)
+		return
+	client(args)
+	if args.incremental:
+		incremental_backup(args)
+		return
+	with trace_span("walk"):
+		secrets_keys = list_keys(args)
+	if args.archive:
+		import time
+		archive = os.path.join(args.dir, f"{args.src}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.vbak")
+		write_backup_archive(archive, secrets_keys, args, key)
+		return
+	with trace_span("read", count=len(secrets_keys)):
+		secrets = list_secrets(secrets_keys)
+	with trace_span("write"):
+		make_structure(secrets,args.dir,args.src)
 
 def handle_restore(args):
 	print(args.src)
 
 def handle_sync(args):
 	global final_structure
+	if args.resume or args.retry_failed:
+		resume_sync(args)
+		return
 	actions = list(final_structure.get("vault_cfg").get("actions").keys())
 	import_files = check_type_files('sync',actions)
+	sync_jobs = []
+	clients = {}
 	for file in import_files:
-		path_list = []
 		if os.path.isfile(file) == False:
 			print("File does not exists")
 			exit(1)
-		with open(file) as f:
-			parsed_yaml_file = yaml.safe_load(f)
+		parsed_yaml_file = read_yaml(file)
 		if parsed_yaml_file['kind'] == 'sync' and args.src == parsed_yaml_file['target'].split('/')[0]:
-			cluster_name = parsed_yaml_file['target'].split('/',1)[1] if len(parsed_yaml_file['target'].split('/',1)) > 1 else args.src 
+			pair = (parsed_yaml_file["source"],parsed_yaml_file["target"])
+			if pair not in clients:
+				client(args,method="sync",source=pair[0],target=pair[1])
+				clients[pair] = (client_src,client_dst)
 			for job in parsed_yaml_file["jobs"]:
-				client(args,method="sync",source=parsed_yaml_file["source"],target=parsed_yaml_file["target"])
-				process_sync_job(job,client_src,client_dst)
+				sync_jobs.append(pair + (job,) + clients[pair])
+	if args.follow:
+		follow_sync([(job,job_client_src,job_client_dst) for source,target,job,job_client_src,job_client_dst in sync_jobs],args)
+		return
+	from concurrent.futures import ThreadPoolExecutor
+	with ThreadPoolExecutor(max_workers=MIRROR_WALKERS) as walkers:
+		mirror_folders = start_mirror_walks(sync_jobs, walkers)
+		with trace_span("plan"):
+			plan, estimate = build_sync_plan(sync_jobs)
+	print(f"Sync plan: {estimate['read']} source secrets, {estimate['write']} destination writes")
+	print(f"  LIST  {estimate['list']} (jobs alone would need {estimate['list_jobs']})")
+	print(f"  READ  {estimate['read']} (jobs alone would need {estimate['read_jobs']})")
+	print(f"  WRITE {estimate['write']} (jobs alone would need {estimate['write_jobs']})")
+	if not args.dry_run:
+		db = journal_open(args)
+		run_journaled_sync(db, journal_start(db, args.src, plan), plan)
+	if mirror_folders:
+		run_mirror(mirror_folders, plan, args)
+
+def build_sync_plan(sync_jobs):
+	# Expand every job into source secret -> destinations, so shared subtrees are listed
+	# once and every source secret is read once no matter how many jobs include it
+	plan = {}
+	listings = {}
+	estimate = {"list": 0, "list_jobs": 0, "read_jobs": 0, "write_jobs": 0}
+
+	def list_folder(source, job_client_src, mnt, folder):
+		estimate["list_jobs"] += 1
+		key = (source, mnt, folder)
+		if key not in listings:
+			estimate["list"] += 1
+			try:
+				listings[key] = job_client_src.secrets.kv.v2.list_secrets(mount_point=mnt, path=folder)['data']['keys']
+			except hvac.exceptions.InvalidPath:
+				print(f"Error: The path {folder} does not exist or is incorrect.")
+				listings[key] = []
+		return listings[key]
+
+	def add(source, job_client_src, src_mnt, src_path, target, job_client_dst, dst_mnt, dst_path):
+		# Run job by job, every job reads and writes its own copy of the secret
+		estimate["read_jobs"] += 1
+		estimate["write_jobs"] += 1
+		entry = plan.setdefault((source, src_mnt, src_path), (job_client_src, {}))
+		entry[1][(target, dst_mnt, dst_path)] = job_client_dst
+
+	def walk(source, job_client_src, src_mnt, src_base, target, job_client_dst, dst_mnt, dst_base, path_filter):
+		for key in list_folder(source, job_client_src, src_mnt, src_base):
+			if not path_allowed(path_filter, f"{src_mnt}/{src_base}{key}"):
+				continue
+			if key.endswith('/'):
+				walk(source, job_client_src, src_mnt, f"{src_base}{key}", target, job_client_dst, dst_mnt, f"{dst_base}{key}", path_filter)
+			else:
+				add(source, job_client_src, src_mnt, f"{src_base}{key}", target, job_client_dst, dst_mnt, f"{dst_base}{key}")
+
+	for source, target, job, job_client_src, job_client_dst in sync_jobs:
+		path_filter = compile_path_filter(job.get('include'), job.get('exclude'))
+		for src_mnt, src_path, dst_mnt, dst_path, is_directory in sync_job_targets(job):
+			if not path_allowed(path_filter, f"{src_mnt}/{src_path}"):
+				continue
+			if is_directory:
+				walk(source, job_client_src, src_mnt, src_path, target, job_client_dst, dst_mnt, dst_path, path_filter)
+			else:
+				add(source, job_client_src, src_mnt, src_path, target, job_client_dst, dst_mnt, dst_path)
+	estimate["read"] = len(plan)
+	estimate["write"] = sum(len(destinations) for job_client_src, destinations in plan.values())
+	return plan, estimate
+
+def execute_sync_plan(plan, record=None):
+	# record(source + destination key, status, error) is called for every destination, see journal_recorder
+	written = 0
+	failed = 0
+	if record == None:
+		record = lambda item, status, error=None: None
+	for (source, src_mnt, src_path), (job_client_src, destinations) in plan.items():
+		with trace_span("copy", secret=f"{src_mnt}/{src_path}"):
+			try:
+				response = job_client_src.secrets.kv.v2.read_secret_version(mount_point=src_mnt, path=src_path,raise_on_deleted_version=True)
+				data = response['data']['data']
+			except hvac.exceptions.InvalidPath:
+				print(f"Skipped: {src_mnt}/{src_path} non found")
+				for target_key in destinations:
+					record((source, src_mnt, src_path) + target_key, "skipped")
+				continue
+			except Exception as e:
+				print(f"Error on {src_path}: {e}")
+				failed += len(destinations)
+				for target_key in destinations:
+					record((source, src_mnt, src_path) + target_key, "failed", f"read: {e}")
+				continue
+			for (target, dst_mnt, dst_path), job_client_dst in destinations.items():
+				try:
+					job_client_dst.secrets.kv.v2.create_or_update_secret(mount_point=dst_mnt, path=dst_path, secret=data)
+					print(f"Ok: {src_mnt}/{src_path} -> {dst_mnt}/{dst_path}")
+					written += 1
+					record((source, src_mnt, src_path, target, dst_mnt, dst_path), "ok")
+				except Exception as e:
+					print(f"Error on {src_path}: {e}")
+					failed += 1
+					record((source, src_mnt, src_path, target, dst_mnt, dst_path), "failed", f"write: {e}")
+	return written, failed
 
 def parse_vault_path(full_path):
     clean_path = full_path.lstrip('/')
@@ -221,7 +496,8 @@ def parse_vault_path(full_path):
         return parts[0], "" 
     return parts[0], parts[1]
 
-def process_sync_job(job,client_src,client_dst):
+def sync_job_targets(job):
+	targets = []
 	raw_sources = job['source_path']
 	sources = raw_sources if isinstance(raw_sources, list) else [raw_sources]
 	full_dest = job['destination_path']
@@ -230,23 +506,36 @@ def process_sync_job(job,client_src,client_dst):
 		src_mnt, src_path = parse_vault_path(full_src)
 		is_directory = full_src.endswith('/')
 		if is_directory:
-			sync_recursive_folder(client_src,client_dst,src_mnt,src_path,dst_mnt,dst_path_base)
+			targets.append((src_mnt,src_path,dst_mnt,dst_path_base,True))
 		else:
 			final_dst_path = dst_path_base
 			if full_dest.endswith('/'):
 				filename = src_path.split('/')[-1]
 				final_dst_path = os.path.join(dst_path_base, filename)
-			sync_single_secret(client_src,client_dst,src_mnt,src_path,dst_mnt,final_dst_path)
+			targets.append((src_mnt,src_path,dst_mnt,final_dst_path,False))
+	return targets
 
-def sync_recursive_folder(client_src, client_dst,src_mnt, src_base, dst_mnt, dst_base):
+def process_sync_job(job,client_src,client_dst):
+	path_filter = compile_path_filter(job.get('include'), job.get('exclude'))
+	for src_mnt, src_path, dst_mnt, dst_path, is_directory in sync_job_targets(job):
+		if not path_allowed(path_filter, f"{src_mnt}/{src_path}"):
+			continue
+		if is_directory:
+			sync_recursive_folder(client_src,client_dst,src_mnt,src_path,dst_mnt,dst_path,path_filter)
+		else:
+			sync_single_secret(client_src,client_dst,src_mnt,src_path,dst_mnt,dst_path)
+
+def sync_recursive_folder(client_src, client_dst,src_mnt, src_base, dst_mnt, dst_base, path_filter=None):
 	try:
 		list_resp = client_src.secrets.kv.v2.list_secrets(mount_point=src_mnt, path=src_base)
 		keys = list_resp['data']['keys']
 		for key in keys:
 			curr_src = f"{src_base}{key}"
 			curr_dst = f"{dst_base}{key}"
+			if not path_allowed(path_filter, f"{src_mnt}/{curr_src}"):
+				continue
 			if key.endswith('/'):
-				sync_recursive_folder(client_src, client_dst,src_mnt, curr_src, dst_mnt, curr_dst)
+				sync_recursive_folder(client_src, client_dst,src_mnt, curr_src, dst_mnt, curr_dst, path_filter)
 			else:
 				sync_single_secret(client_src,client_dst, src_mnt, curr_src, dst_mnt, curr_dst)
 	except hvac.exceptions.InvalidPath:
@@ -258,12 +547,1333 @@ def sync_single_secret(client_src, client_dst, src_mnt, src_path, dst_mnt, dst_p
 		data = response['data']['data']
 		client_dst.secrets.kv.v2.create_or_update_secret(mount_point=dst_mnt, path=dst_path, secret=data)
 		print(f"Ok: {src_mnt}/{src_path} -> {dst_mnt}/{dst_path}")
+		return True
 	except hvac.exceptions.InvalidPath:
 		print(f"Skipped: {src_mnt}/{src_path} non found")
 	except Exception as e:
 		print(f"Error on {src_path}: {e}")
+	return False
+
+# ============ Sync journal ============
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, vault TEXT NOT NULL, started REAL NOT NULL, finished REAL);
+CREATE TABLE IF NOT EXISTS items (
+	run INTEGER NOT NULL, source TEXT NOT NULL, src_mnt TEXT NOT NULL, src_path TEXT NOT NULL,
+	target TEXT NOT NULL, dst_mnt TEXT NOT NULL, dst_path TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending', error TEXT,
+	PRIMARY KEY (run, source, src_mnt, src_path, target, dst_mnt, dst_path)
+);
+"""
+JOURNAL_FLUSH_INTERVAL = 1.0
+JOURNAL_KEEP_RUNS = 10
+
+def journal_open(args):
+	import sqlite3
+	journal_file = args.journal or os.path.join(cache_dir, f"sync-{args.src}.journal.sqlite")
+	os.makedirs(os.path.dirname(os.path.abspath(journal_file)), exist_ok=True)
+	db = sqlite3.connect(journal_file)
+	db.execute("PRAGMA journal_mode=WAL")
+	db.execute("PRAGMA synchronous=NORMAL")
+	db.executescript(JOURNAL_SCHEMA)
+	return db
+
+def journal_start(db, vault, plan):
+	# Journal the whole plan up front, a resumed run then needs no LIST at all
+	import time
+	with db:
+		run = db.execute("INSERT INTO runs (vault, started) VALUES (?, ?)", (vault, time.time())).lastrowid
+		db.executemany("INSERT OR IGNORE INTO items (run, source, src_mnt, src_path, target, dst_mnt, dst_path) VALUES (?, ?, ?, ?, ?, ?, ?)",
+			[(run,) + source_key + target_key for source_key, (job_client_src, destinations) in plan.items() for target_key in destinations])
+		old_runs = "SELECT id FROM runs WHERE vault = ? ORDER BY id DESC LIMIT -1 OFFSET ?"
+		db.execute(f"DELETE FROM items WHERE run IN ({old_runs})", (vault, JOURNAL_KEEP_RUNS))
+		db.execute(f"DELETE FROM runs WHERE id IN ({old_runs})", (vault, JOURNAL_KEEP_RUNS))
+	return run
+
+def journal_plan(db, run):
+	# Pending items of a run in the layout of build_sync_plan
+	plan = {}
+	clients = {}
+	for source, src_mnt, src_path, target, dst_mnt, dst_path in db.execute("SELECT source, src_mnt, src_path, target, dst_mnt, dst_path FROM items WHERE run = ? AND status = 'pending'", (run,)):
+		for name in (source, target):
+			if name not in clients:
+				clients[name] = cluster_client(name)
+		entry = plan.setdefault((source, src_mnt, src_path), (clients[source], {}))
+		entry[1][(target, dst_mnt, dst_path)] = clients[target]
+	return plan
+
+def journal_recorder(db, run):
+	# Marks are written in one transaction per JOURNAL_FLUSH_INTERVAL, a crash repeats at most
+	# that much work and rewriting a secret with the same data is harmless
+	import time
+	marks = []
+	flushed = [time.monotonic()]
+
+	def flush():
+		with db:
+			db.executemany("UPDATE items SET status = ?, error = ? WHERE run = ? AND source = ? AND src_mnt = ? AND src_path = ? AND target = ? AND dst_mnt = ? AND dst_path = ?", marks)
+		marks.clear()
+		flushed[0] = time.monotonic()
+
+	def record(item, status, error=None):
+		marks.append((status, error, run) + item)
+		if time.monotonic() - flushed[0] >= JOURNAL_FLUSH_INTERVAL:
+			flush()
+
+	return record, flush
+
+def run_journaled_sync(db, run, plan):
+	import time
+	record, flush = journal_recorder(db, run)
+	try:
+		execute_sync_plan(plan, record)
+	finally:
+		flush()
+	counts = dict(db.execute("SELECT status, COUNT(*) FROM items WHERE run = ? GROUP BY status", (run,)).fetchall())
+	with db:
+		db.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), run))
+	print(f"Sync run {run}: {counts.get('ok', 0)} written, {counts.get('failed', 0)} failed, {counts.get('skipped', 0)} skipped")
+	if counts.get("failed"):
+		print("Re-run only the failed items with --retry-failed")
+
+def resume_sync(args):
+	db = journal_open(args)
+	row = db.execute("SELECT id FROM runs WHERE vault = ? ORDER BY id DESC LIMIT 1", (args.src,)).fetchone()
+	if row == None:
+		print(f"No journaled sync run for {args.src}")
+		sys.exit(1)
+	run = row[0]
+	if args.retry_failed:
+		with db:
+			db.execute("UPDATE items SET status = 'pending', error = NULL WHERE run = ? AND status = 'failed'", (run,))
+	import_vault_modules()
+	plan = journal_plan(db, run)
+	pending = sum(len(destinations) for job_client_src, destinations in plan.values())
+	print(f"Sync run {run}: {pending} writes left")
+	if args.dry_run or not pending:
+		return
+	run_journaled_sync(db, run, plan)
+
+# ============ Sync mirror ============
+
+MIRROR_MAX_FRACTION = 0.1
+MIRROR_WALKERS = 8
+
+def start_mirror_walks(sync_jobs, executor):
+	# Destination folders of mirror jobs, walked on executor while build_sync_plan walks the sources
+	folders = {}
+	for source, target, job, job_client_src, job_client_dst in sync_jobs:
+		mode = job.get('mirror')
+		if not mode:
+			continue
+		mode = "delete" if mode is True else mode
+		if mode not in ("delete", "soft-delete"):
+			print(f"Unknown mirror mode {mode}, use delete or soft-delete")
+			sys.exit(1)
+		path_filter = compile_path_filter(job.get('include'), job.get('exclude'))
+		for src_mnt, src_path, dst_mnt, dst_path, is_directory in sync_job_targets(job):
+			if not is_directory:
+				continue
+			if dst_path and not dst_path.endswith('/'):
+				print(f"Mirror skipped for {dst_mnt}/{dst_path}: the destination of a mirrored folder must end with /")
+				continue
+			key = (target, dst_mnt, dst_path)
+			if key not in folders:
+				folders[key] = {"client": job_client_dst, "mode": mode, "max_fraction": None, "scopes": [],
+					"walk": executor.submit(list_all_recursive, job_client_dst, dst_path, dst_mnt)}
+			folder = folders[key]
+			# Jobs sharing a destination folder: a soft delete and the lower limit win
+			if mode == "soft-delete":
+				folder["mode"] = mode
+			max_fraction = float(job.get('mirror_max_fraction', MIRROR_MAX_FRACTION))
+			folder["max_fraction"] = max_fraction if folder["max_fraction"] == None else min(folder["max_fraction"], max_fraction)
+			folder["scopes"].append((src_mnt, src_path, path_filter))
+	return folders
+
+def mirror_deletions(folder, planned, target, dst_mnt, dst_base):
+	# Destination secrets no job writes, except those a job's include / exclude puts out of its scope.
+	# Also returns the size of the folder once the sync has written its secrets.
+	existing = {parse_vault_path(secret) for secret in folder["walk"].result()}
+	written = {(mnt, path) for planned_target, mnt, path in planned if planned_target == target and mnt == dst_mnt and path.startswith(dst_base)}
+	deletions = []
+	for mnt, path in existing:
+		if (target, mnt, path) in planned:
+			continue
+		rel_path = path[len(dst_base):]
+		if all(path_allowed(path_filter, f"{src_mnt}/{src_base}{rel_path}") for src_mnt, src_base, path_filter in folder["scopes"]):
+			deletions.append((mnt, path))
+	return len(existing | written), sorted(deletions)
+
+def is_soft_deleted(client_dst, item):
+	# Soft deleted secrets stay listed, their current version carries a deletion time
+	mnt, path = item
+	metadata = client_dst.secrets.kv.v2.read_secret_metadata(mount_point=mnt, path=path)['data']
+	return bool(metadata['versions'].get(str(metadata['current_version']), {}).get('deletion_time'))
+
+def run_mirror(folders, plan, args):
+	planned = {target_key for job_client_src, destinations in plan.values() for target_key in destinations}
+	refused = []
+	failed_deletes = 0
+	for (target, dst_mnt, dst_base), folder in folders.items():
+		try:
+			with trace_span("mirror diff", folder=f"{dst_mnt}/{dst_base}"):
+				size, deletions = mirror_deletions(folder, planned, target, dst_mnt, dst_base)
+				if folder["mode"] == "soft-delete" and deletions:
+					from concurrent.futures import ThreadPoolExecutor
+					with ThreadPoolExecutor(max_workers=max(1, args.mirror_workers)) as executor:
+						deleted = list(executor.map(lambda item: is_soft_deleted(folder["client"], item), deletions))
+					deletions = [item for item, done in zip(deletions, deleted) if not done]
+		except Exception as e:
+			# e.g. Forbidden on the destination LIST: nothing is known to be safe to delete there
+			print(f"Mirror {target} {dst_mnt}/{dst_base}: cannot read the destination, {type(e).__name__} {e}")
+			refused.append(f"{dst_mnt}/{dst_base}")
+			continue
+		fraction = len(deletions) / max(size, 1)
+		max_fraction = args.mirror_max_fraction if args.mirror_max_fraction != None else folder["max_fraction"]
+		print(f"Mirror {target} {dst_mnt}/{dst_base}: {size} secrets after the sync, {len(deletions)} only on the destination ({fraction:.1%}), {folder['mode']}")
+		if fraction > max_fraction:
+			# An empty or unreadable source would otherwise wipe the destination
+			print(f"  Refusing: more than {max_fraction:.1%} of the destination, raise mirror_max_fraction or --mirror-max-fraction if intended")
+			refused.append(f"{dst_mnt}/{dst_base}")
+			continue
+		if args.dry_run:
+			for mnt, path in deletions:
+				print(f"  Would {folder['mode']}: {mnt}/{path}")
+			continue
+		client_dst = folder["client"]
+
+		def remove(item):
+			mnt, path = item
+			if folder["mode"] == "soft-delete":
+				client_dst.secrets.kv.v2.delete_latest_version_of_secret(mount_point=mnt, path=path)
+				return f"Soft-deleted: {mnt}/{path}"
+			client_dst.secrets.kv.v2.delete_metadata_and_all_versions(mount_point=mnt, path=path)
+			return f"Deleted: {mnt}/{path}"
+
+		failed = run_concurrently(remove, deletions, args.mirror_workers, args.mirror_rate)
+		failed_deletes += len(failed)
+		print(f"  Removed {len(deletions) - len(failed)} secrets, {len(failed)} errors")
+	if refused:
+		print(f"Mirror refused for {len(refused)} folder(s): {', '.join(refused)}")
+	if failed_deletes:
+		print(f"Mirror failed to remove {failed_deletes} secret(s)")
+	if refused or failed_deletes:
+		sys.exit(1)
 
+# ============ Sync follow mode ============
 
+def parse_vault_time(value):
+	# Vault returns RFC3339 with nanoseconds, datetime only takes microseconds
+	import datetime
+	if not value:
+		return None
+	match = re.match(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?', value)
+	if not match:
+		return None
+	parsed = datetime.datetime.strptime(match.group(1), "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
+	return parsed.timestamp() + float(f"0.{match.group(2) or 0}")
+
+def write_follow_metrics(metrics_file, metrics):
+	lines = []
+	for name, (kind, help_text, value) in sorted(metrics.items()):
+		lines.append(f"# HELP {name} {help_text}")
+		lines.append(f"# TYPE {name} {kind}")
+		lines.append(f"{name} {value}")
+	tmp_file = f"{metrics_file}.{os.getpid()}"
+	with open(tmp_file, "w") as f:
+		f.write("\n".join(lines) + "\n")
+	os.replace(tmp_file, metrics_file)
+
+def follow_sync(follow_jobs, args):
+	import heapq
+	import time
+	# Every folder (or single-secret source) is its own subtree with its own poll interval:
+	# intervals halve when a poll finds changes and double when it does not
+	subtrees = {}
+	schedule = []
+	counter = [0]
+	metrics = {
+		"vault_sync_follow_polls_total": ["counter", "Subtree polls", 0],
+		"vault_sync_follow_list_calls_total": ["counter", "LIST calls made on sources", 0],
+		"vault_sync_follow_metadata_calls_total": ["counter", "Metadata reads made on sources", 0],
+		"vault_sync_follow_synced_total": ["counter", "Secrets copied to destinations", 0],
+		"vault_sync_follow_deleted_total": ["counter", "Secrets deleted on destinations", 0],
+		"vault_sync_follow_errors_total": ["counter", "Failed polls, reads or writes", 0],
+		"vault_sync_follow_poll_seconds_total": ["counter", "Time spent polling", 0.0],
+		"vault_sync_follow_lag_seconds": ["gauge", "Source update to destination write delay of the last synced secret", 0.0],
+		"vault_sync_follow_lag_seconds_max": ["gauge", "Highest replication lag seen", 0.0],
+		"vault_sync_follow_subtrees": ["gauge", "Subtrees currently tracked", 0],
+		"vault_sync_follow_secrets": ["gauge", "Secrets in the version index", 0],
+	}
+
+	def add_subtree(key, subtree):
+		subtrees[key] = subtree
+		counter[0] += 1
+		heapq.heappush(schedule, (time.monotonic(), counter[0], key))
+
+	def drop_subtree(key):
+		subtree = subtrees.pop(key, None)
+		if subtree == None:
+			return
+		for name in list(subtree["versions"]):
+			delete_secret(subtree, name)
+		for child in subtree["folders"]:
+			drop_subtree(child)
+
+	def delete_secret(subtree, name):
+		subtree["versions"].pop(name, None)
+		if not subtree["deletes"]:
+			return
+		dst_path = subtree["dst"] if subtree["single"] else f"{subtree['dst']}{name}"
+		try:
+			subtree["client_dst"].secrets.kv.v2.delete_metadata_and_all_versions(mount_point=subtree["dst_mnt"], path=dst_path)
+			metrics["vault_sync_follow_deleted_total"][2] += 1
+			print(f"Deleted: {subtree['dst_mnt']}/{dst_path}")
+		except Exception as e:
+			metrics["vault_sync_follow_errors_total"][2] += 1
+			print(f"Error deleting {subtree['dst_mnt']}/{dst_path}: {e}")
+
+	def sync_changed(subtree, name):
+		src_path = subtree["src"] if subtree["single"] else f"{subtree['src']}{name}"
+		dst_path = subtree["dst"] if subtree["single"] else f"{subtree['dst']}{name}"
+		try:
+			metadata = subtree["client_src"].secrets.kv.v2.read_secret_metadata(mount_point=subtree["src_mnt"], path=src_path)['data']
+		except hvac.exceptions.InvalidPath:
+			return None
+		finally:
+			metrics["vault_sync_follow_metadata_calls_total"][2] += 1
+		version = metadata.get("current_version")
+		if subtree["versions"].get(name) == version:
+			return False
+		if sync_single_secret(subtree["client_src"], subtree["client_dst"], subtree["src_mnt"], src_path, subtree["dst_mnt"], dst_path):
+			subtree["versions"][name] = version
+			metrics["vault_sync_follow_synced_total"][2] += 1
+			updated = parse_vault_time(metadata.get("updated_time"))
+			# The first poll of a subtree copies what was already there, that is no replication lag
+			if updated != None and subtree["indexed"]:
+				lag = max(0.0, time.time() - updated)
+				metrics["vault_sync_follow_lag_seconds"][2] = lag
+				metrics["vault_sync_follow_lag_seconds_max"][2] = max(lag, metrics["vault_sync_follow_lag_seconds_max"][2])
+		else:
+			metrics["vault_sync_follow_errors_total"][2] += 1
+		return True
+
+	def poll(key):
+		subtree = subtrees[key]
+		changed = False
+		if subtree["single"]:
+			result = sync_changed(subtree, "")
+			if result == None and "" in subtree["versions"]:
+				delete_secret(subtree, "")
+				changed = True
+			return changed or bool(result)
+		try:
+			keys = subtree["client_src"].secrets.kv.v2.list_secrets(mount_point=subtree["src_mnt"], path=subtree["src"])['data']['keys']
+		except hvac.exceptions.InvalidPath:
+			keys = []
+		finally:
+			metrics["vault_sync_follow_list_calls_total"][2] += 1
+		keys = [k for k in keys if path_allowed(subtree["filter"], f"{subtree['src_mnt']}/{subtree['src']}{k}")]
+		names = {k for k in keys if not k.endswith('/')}
+		folders = {k for k in keys if k.endswith('/')}
+		for name in sorted(names):
+			if sync_changed(subtree, name):
+				changed = True
+		for name in [n for n in subtree["versions"] if n not in names]:
+			delete_secret(subtree, name)
+			changed = True
+		current = set()
+		for folder in folders:
+			child_key = key[:2] + (f"{subtree['src']}{folder}",)
+			current.add(child_key)
+			if child_key not in subtrees:
+				# A folder created after the parent was indexed holds new secrets only
+				add_subtree(child_key, dict(subtree, src=f"{subtree['src']}{folder}", dst=f"{subtree['dst']}{folder}", versions={}, folders=set(), interval=args.min_interval, indexed=subtree["indexed"]))
+				changed = True
+		for child_key in subtree["folders"] - current:
+			drop_subtree(child_key)
+			changed = True
+		subtree["folders"] = current
+		return changed
+
+	for job_index, (job, job_client_src, job_client_dst) in enumerate(follow_jobs):
+		deletes = args.propagate_deletes or bool(job.get('propagate_deletes', False))
+		path_filter = compile_path_filter(job.get('include'), job.get('exclude'))
+		for target_index, (src_mnt, src_path, dst_mnt, dst_path, is_directory) in enumerate(sync_job_targets(job)):
+			if not path_allowed(path_filter, f"{src_mnt}/{src_path}"):
+				continue
+			add_subtree((job_index, target_index, src_path), {
+				"client_src": job_client_src, "client_dst": job_client_dst,
+				"src_mnt": src_mnt, "src": src_path, "dst_mnt": dst_mnt, "dst": dst_path,
+				"single": not is_directory, "deletes": deletes, "filter": path_filter,
+				"versions": {}, "folders": set(), "interval": args.interval, "indexed": False,
+			})
+
+	print(f"Following {len(subtrees)} source path(s), Ctrl-C to stop")
+	try:
+		while schedule:
+			due, _, key = heapq.heappop(schedule)
+			if key not in subtrees:
+				continue
+			wait = due - time.monotonic()
+			if wait > 0:
+				time.sleep(wait)
+			started = time.monotonic()
+			subtree = subtrees[key]
+			try:
+				changed = poll(key)
+				subtree["indexed"] = True
+			except Exception as e:
+				print(f"Error polling {subtree['src_mnt']}/{subtree['src']}: {e}")
+				metrics["vault_sync_follow_errors_total"][2] += 1
+				changed = False
+			if changed:
+				subtree["interval"] = max(args.min_interval, subtree["interval"] / 2)
+			else:
+				subtree["interval"] = min(args.max_interval, subtree["interval"] * 2)
+			metrics["vault_sync_follow_polls_total"][2] += 1
+			metrics["vault_sync_follow_poll_seconds_total"][2] += time.monotonic() - started
+			metrics["vault_sync_follow_subtrees"][2] = len(subtrees)
+			metrics["vault_sync_follow_secrets"][2] = sum(len(s["versions"]) for s in subtrees.values())
+			if key in subtrees:
+				counter[0] += 1
+				heapq.heappush(schedule, (time.monotonic() + subtree["interval"], counter[0], key))
+			if args.metrics_file:
+				write_follow_metrics(args.metrics_file, metrics)
+	except KeyboardInterrupt:
+		print("Follow stopped")
+
+
+# ============ Subtree delete / move ============
+
+def rate_limiter(rate):
+	# Spaces calls at least 1/rate seconds apart across all threads, rate 0 means no limit
+	import threading
+	import time
+	lock = threading.Lock()
+	next_slot = [0.0]
+
+	def wait():
+		if not rate:
+			return
+		with lock:
+			slot = max(time.monotonic(), next_slot[0])
+			next_slot[0] = slot + 1.0 / rate
+		delay = slot - time.monotonic()
+		if delay > 0:
+			time.sleep(delay)
+	return wait
+
+def run_concurrently(func, items, workers, rate):
+	from concurrent.futures import ThreadPoolExecutor, as_completed
+	wait = rate_limiter(rate)
+
+	def call(item):
+		wait()
+		with trace_span(getattr(func, "__name__", "item"), item=str(item)):
+			return func(item)
+
+	failed = []
+	with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+		futures = {executor.submit(call, item): item for item in items}
+		for done, future in enumerate(as_completed(futures), 1):
+			try:
+				print(f"[{done}/{len(items)}] {future.result()}")
+			except Exception as e:
+				failed.append(futures[future])
+				print(f"[{done}/{len(items)}] Error on {futures[future]}: {e}")
+	return failed
+
+def subtree_paths(client, full_path):
+	# A path ending with '/' is a folder and expands to every secret below it
+	mnt, path = parse_vault_path(full_path)
+	if not full_path.endswith('/'):
+		return [(mnt, path)]
+	return [parse_vault_path(secret) for secret in list_all_recursive(client, path, mnt)]
+
+def handle_delete(args):
+	client(args)
+	items = subtree_paths(client, args.path)
+	print(f"{len(items)} secrets under {args.path}")
+	if args.dry_run:
+		for mnt, path in items:
+			print(f"Would delete: {mnt}/{path}")
+		return
+
+	def delete(item):
+		mnt, path = item
+		client.secrets.kv.v2.delete_metadata_and_all_versions(mount_point=mnt, path=path)
+		return f"Deleted: {mnt}/{path}"
+
+	failed = run_concurrently(delete, items, args.workers, args.rate)
+	print(f"Deleted {len(items) - len(failed)} secrets, {len(failed)} errors")
+	if failed:
+		sys.exit(1)
+
+def handle_move(args):
+	client(args)
+	if args.source.endswith('/') and not args.destination.endswith('/'):
+		# A folder is moved into a folder, kv/new is read as kv/new/
+		args.destination += '/'
+	src_mnt, src_base = parse_vault_path(args.source)
+	dst_mnt, dst_base = parse_vault_path(args.destination)
+	if args.source.endswith('/') and src_mnt == dst_mnt and dst_base.startswith(src_base):
+		print("Destination is inside the source folder")
+		sys.exit(1)
+	moves = []
+	for mnt, path in subtree_paths(client, args.source):
+		if args.source.endswith('/'):
+			dst_path = f"{dst_base}{path[len(src_base):]}"
+		elif args.destination.endswith('/'):
+			dst_path = os.path.join(dst_base, path.split('/')[-1])
+		else:
+			dst_path = dst_base
+		moves.append((mnt, path, dst_mnt, dst_path))
+	print(f"{len(moves)} secrets under {args.source}")
+	if args.dry_run:
+		for mnt, path, dst_mnt, dst_path in moves:
+			print(f"Would move: {mnt}/{path} -> {dst_mnt}/{dst_path}")
+		return
+
+	def move(item):
+		mnt, path, dst_mnt, dst_path = item
+		data = client.secrets.kv.v2.read_secret_version(mount_point=mnt, path=path, raise_on_deleted_version=True)['data']['data']
+		client.secrets.kv.v2.create_or_update_secret(mount_point=dst_mnt, path=dst_path, secret=data)
+		client.secrets.kv.v2.delete_metadata_and_all_versions(mount_point=mnt, path=path)
+		return f"Moved: {mnt}/{path} -> {dst_mnt}/{dst_path}"
+
+	failed = run_concurrently(move, moves, args.workers, args.rate)
+	print(f"Moved {len(moves) - len(failed)} secrets, {len(failed)} errors")
+	if failed:
+		sys.exit(1)
+
+# ============ Work queue ============
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS units (
+	id INTEGER PRIMARY KEY, kind TEXT NOT NULL, vault TEXT NOT NULL, payload TEXT NOT NULL,
+	status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, not_before REAL NOT NULL DEFAULT 0,
+	owner TEXT, lease_until REAL, updated REAL, result TEXT, error TEXT
+);
+CREATE INDEX IF NOT EXISTS units_claim ON units (status, not_before);
+"""
+
+def queue_open(queue_file):
+	import sqlite3
+	os.makedirs(os.path.dirname(os.path.abspath(queue_file)), exist_ok=True)
+	db = sqlite3.connect(queue_file, timeout=60, isolation_level=None)
+	# Not WAL: its shared-memory index only works for processes on one host, the rollback
+	# journal relies on file locks alone, which workers on other hosts can share
+	db.execute("PRAGMA journal_mode=DELETE")
+	db.executescript(QUEUE_SCHEMA)
+	return db
+
+def queue_meta(db, key, default=None):
+	row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+	return row[0] if row else default
+
+def split_sync_job(client_src, job, unit_secrets):
+	# A directory source becomes one job per first level folder plus its direct secrets in
+	# groups of unit_secrets, each secret as its own single-secret job with the walk's destination
+	path_filter = compile_path_filter(job.get('include'), job.get('exclude'))
+	filters = {key: job[key] for key in ('include', 'exclude') if job.get(key)}
+	units = []
+	for src_mnt, src_path, dst_mnt, dst_path, is_directory in sync_job_targets(job):
+		if not path_allowed(path_filter, f"{src_mnt}/{src_path}"):
+			continue
+		if not is_directory:
+			units.append([dict(filters, source_path=f"{src_mnt}/{src_path}", destination_path=f"{dst_mnt}/{dst_path}")])
+			continue
+		try:
+			keys = client_src.secrets.kv.v2.list_secrets(mount_point=src_mnt, path=src_path)['data']['keys']
+		except hvac.exceptions.InvalidPath:
+			print(f"Error: The path {src_path} does not exist or is incorrect.")
+			continue
+		secrets_jobs = []
+		for key in keys:
+			if not path_allowed(path_filter, f"{src_mnt}/{src_path}{key}"):
+				continue
+			unit_job = dict(filters, source_path=f"{src_mnt}/{src_path}{key}", destination_path=f"{dst_mnt}/{dst_path}{key}")
+			if key.endswith('/'):
+				units.append([unit_job])
+			else:
+				secrets_jobs.append(unit_job)
+		for start in range(0, len(secrets_jobs), unit_secrets):
+			units.append(secrets_jobs[start:start + unit_secrets])
+	return units
+
+def queue_plan(db, args):
+	import time
+	import_vault_modules()
+	vaults = args.vault or list(final_structure.get("vault_cfg",{}).get("clusters",{}).keys())
+	if db.execute("SELECT COUNT(*) FROM units").fetchone()[0]:
+		if not args.reset:
+			print(f"{args.queue} already holds a run, use --reset to plan a new one")
+			sys.exit(1)
+	actions = list(final_structure.get("vault_cfg").get("actions").keys())
+	units = []
+	import_vaults = []
+	for file in check_type_files('import', actions):
+		vault = read_yaml(file)['target'].split('/')[0]
+		if vault in vaults and vault not in import_vaults:
+			import_vaults.append(vault)
+			units.append(("import", vault, {}))
+	source_clients = {}
+	mirrored = []
+	for file in check_type_files('sync', actions):
+		parsed_yaml_file = read_yaml(file)
+		vault = parsed_yaml_file['target'].split('/')[0]
+		if parsed_yaml_file['kind'] != 'sync' or vault not in vaults:
+			continue
+		# Units of a job run apart, so no unit sees the whole source a mirror deletion pass needs
+		mirrored += [f"{file}: {job['source_path']}" for job in parsed_yaml_file["jobs"] if job.get('mirror')]
+		if mirrored:
+			continue
+		source = parsed_yaml_file["source"]
+		if source not in source_clients:
+			source_clients[source] = cluster_client(source)
+		for job in parsed_yaml_file["jobs"]:
+			for unit_jobs in split_sync_job(source_clients[source], job, args.unit_secrets):
+				units.append(("sync", vault, {"source": source, "target": parsed_yaml_file["target"], "jobs": unit_jobs}))
+	if mirrored:
+		print("Mirror jobs cannot run through the queue, run them with sync instead:")
+		for job in mirrored:
+			print(f"  {job}")
+		sys.exit(1)
+	with db:
+		db.execute("BEGIN IMMEDIATE")
+		db.execute("DELETE FROM units")
+		db.executemany("INSERT INTO units (kind, vault, payload) VALUES (?, ?, ?)", [(kind, vault, json.dumps(payload)) for kind, vault, payload in units])
+		for key, value in (("max_attempts", args.max_attempts), ("retry_delay", args.retry_delay), ("planned", time.time())):
+			db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+	print(f"Planned {len(units)} units in {args.queue}: {len(import_vaults)} import, {len(units) - len(import_vaults)} sync")
+
+def queue_claim(db, owner, lease, max_attempts):
+	import time
+	now = time.time()
+	with db:
+		db.execute("BEGIN IMMEDIATE")
+		db.execute("UPDATE units SET status = 'failed', error = 'lease expired on the last attempt', updated = ? WHERE status = 'running' AND lease_until < ? AND attempts >= ?", (now, now, max_attempts))
+		row = db.execute("SELECT id, kind, vault, payload FROM units WHERE not_before <= ? AND (status = 'pending' OR (status = 'running' AND lease_until < ?)) ORDER BY id LIMIT 1", (now, now)).fetchone()
+		if row != None:
+			db.execute("UPDATE units SET status = 'running', owner = ?, lease_until = ?, attempts = attempts + 1, updated = ? WHERE id = ?", (owner, now + lease, now, row[0]))
+	return row
+
+def renew_lease(queue_file, unit_id, owner, lease, stop):
+	# Runs in its own thread with its own connection while the unit is worked on
+	import time
+	db = queue_open(queue_file)
+	while not stop.wait(lease / 3):
+		db.execute("UPDATE units SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'", (time.time() + lease, unit_id, owner))
+	db.close()
+
+def queue_finish(db, unit_id, owner, result, error, max_attempts, retry_delay):
+	import time
+	now = time.time()
+	with db:
+		db.execute("BEGIN IMMEDIATE")
+		row = db.execute("SELECT attempts FROM units WHERE id = ? AND owner = ? AND status = 'running'", (unit_id, owner)).fetchone()
+		if row == None:
+			# The lease expired and another worker owns the unit now
+			return False
+		if error == None:
+			db.execute("UPDATE units SET status = 'done', result = ?, error = NULL, updated = ? WHERE id = ?", (json.dumps(result), now, unit_id))
+		elif row[0] < max_attempts:
+			db.execute("UPDATE units SET status = 'pending', not_before = ?, error = ?, updated = ? WHERE id = ?", (now + retry_delay * 2 ** (row[0] - 1), error, now, unit_id))
+		else:
+			db.execute("UPDATE units SET status = 'failed', error = ?, updated = ? WHERE id = ?", (error, now, unit_id))
+	return True
+
+def run_queue_unit(kind, vault, payload, vault_client):
+	global client
+	global mount_point
+	if kind == "import":
+		client = vault_client(vault)
+		mount_point = sorted(client.sys.list_mounted_secrets_engines()['data'].keys())
+		secrets_data, import_roots = collect_import_items(argparse.Namespace(src=vault))
+		manifest = load_import_manifest(vault)
+		changed_items, skipped = filter_unchanged_import_items(secrets_data, manifest)
+		try:
+			grouped_secrets, sources = group_import_items(changed_items)
+			written = write_import_secrets(grouped_secrets, manifest, sources)
+		finally:
+			save_import_manifest(vault, manifest)
+		return {"secrets": written + skipped, "writes": written}
+	job_client_src = vault_client(payload["source"])
+	job_client_dst = vault_client(payload["target"])
+	plan, estimate = build_sync_plan([(payload["source"], payload["target"], job, job_client_src, job_client_dst) for job in payload["jobs"]])
+	written, failed = execute_sync_plan(plan)
+	if failed:
+		raise RuntimeError(f"{failed} of {estimate['write']} writes failed")
+	return {"secrets": estimate["read"], "writes": written}
+
+def queue_work(db, args):
+	import socket
+	import threading
+	import time
+	owner = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+	max_attempts = int(queue_meta(db, "max_attempts", 3))
+	retry_delay = float(queue_meta(db, "retry_delay", 30))
+	import_vault_modules()
+	clients = {}
+
+	def vault_client(name):
+		if name not in clients:
+			clients[name] = cluster_client(name)
+		return clients[name]
+
+	processed = 0
+	while True:
+		row = queue_claim(db, owner, args.lease, max_attempts)
+		if row == None:
+			if not db.execute("SELECT COUNT(*) FROM units WHERE status IN ('pending', 'running')").fetchone()[0]:
+				break
+			# Units leased by other workers or waiting for a retry
+			time.sleep(args.poll)
+			continue
+		unit_id, kind, vault, payload = row
+		print(f"[{owner}] unit {unit_id}: {kind} {vault}")
+		stop = threading.Event()
+		keeper = threading.Thread(target=renew_lease, args=(args.queue, unit_id, owner, args.lease, stop), daemon=True)
+		keeper.start()
+		result = error = None
+		try:
+			with trace_span(f"unit {unit_id}", kind=kind, vault=vault):
+				result = run_queue_unit(kind, vault, json.loads(payload), vault_client)
+		except Exception as e:
+			error = f"{type(e).__name__}: {e}"
+			print(f"[{owner}] unit {unit_id} failed: {error}")
+		finally:
+			stop.set()
+			keeper.join()
+		if not queue_finish(db, unit_id, owner, result, error, max_attempts, retry_delay):
+			print(f"[{owner}] unit {unit_id}: lease lost, result dropped")
+		processed += 1
+	print(f"[{owner}] queue drained, {processed} units processed")
+
+def queue_report(db, args):
+	rows = db.execute("SELECT id, kind, vault, status, attempts, owner, result, error FROM units ORDER BY id").fetchall()
+	report = {"units": len(rows), "status": {}, "vaults": {}, "workers": {}, "retried": 0, "failed": []}
+	for unit_id, kind, vault, status, attempts, owner, result, error in rows:
+		report["status"][status] = report["status"].get(status, 0) + 1
+		totals = report["vaults"].setdefault(vault, {"units": 0, "done": 0, "failed": 0, "secrets": 0, "writes": 0})
+		totals["units"] += 1
+		if status in ("done", "failed"):
+			totals[status] += 1
+		if status == "done":
+			for key, value in json.loads(result).items():
+				totals[key] += value
+			report["workers"][owner] = report["workers"].get(owner, 0) + 1
+			if attempts > 1:
+				report["retried"] += 1
+		elif status == "failed":
+			report["failed"].append({"id": unit_id, "kind": kind, "vault": vault, "attempts": attempts, "error": error})
+	if args.json:
+		print(json.dumps(report, indent=2))
+	else:
+		print(f"{report['units']} units: " + ", ".join(f"{count} {status}" for status, count in sorted(report["status"].items())) + f", {report['retried']} done after a retry")
+		for vault, totals in sorted(report["vaults"].items()):
+			print(f"  {vault}: {totals['done']}/{totals['units']} units done, {totals['failed']} failed, {totals['secrets']} secrets, {totals['writes']} writes")
+		for owner, count in sorted(report["workers"].items()):
+			print(f"  worker {owner}: {count} units")
+		for unit in report["failed"]:
+			print(f"  Failed unit {unit['id']} ({unit['kind']} {unit['vault']}, {unit['attempts']} attempts): {unit['error']}")
+	return not report["failed"]
+
+def handle_queue(args):
+	import subprocess
+	db = queue_open(args.queue)
+	if args.action == "plan":
+		queue_plan(db, args)
+	elif args.action == "work":
+		queue_work(db, args)
+	elif args.action == "run":
+		# Coordinator and local workers in one command, workers on other hosts can join the same queue
+		queue_plan(db, args)
+		command = [sys.executable, os.path.abspath(__file__), "queue", "work", "--queue", args.queue, "--lease", str(args.lease), "--poll", str(args.poll)]
+		workers = [subprocess.Popen(command) for _ in range(args.workers)]
+		for worker in workers:
+			worker.wait()
+	if args.action in ("report", "run") and not queue_report(db, args):
+		sys.exit(1)
+
+# ============ Cluster nodes ============
+
+# Routing state per cluster, shared by every client of that cluster
+cluster_nodes = {}
+
+def node_urls(cluster):
+	# url is one node, or the nodes of one HA cluster as a list or a comma separated string
+	urls = cluster.get("url") or []
+	if isinstance(urls, str):
+		urls = urls.split(",")
+	return [url.strip().rstrip("/") for url in urls if url and url.strip()]
+
+def cluster_client(name):
+	cluster = final_structure.get("vault_cfg",{}).get("clusters",{}).get(name)
+	if cluster == None:
+		print(f"{name} not in inventory")
+		sys.exit(1)
+	urls = node_urls(cluster)
+	if not urls or not cluster.get("token"):
+		print("No Token / Url Provided")
+		sys.exit(1)
+	import_vault_modules()
+	if len(urls) == 1:
+		return hvac.Client(url=urls[0], token=cluster["token"], verify=False)
+	return hvac.Client(url=urls[0], token=cluster["token"], verify=False, session=node_session(name, urls))
+
+def node_session(name, urls):
+	# Routing, health checks and the circuit breaker are the GUI's core/nodes.py NodeSession
+	if name not in cluster_nodes:
+		cluster_nodes[name] = load_core_module("nodes").NodeSession(urls, verify=False)
+	return cluster_nodes[name]
+
+# ============ Offline catalog ============
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+	id INTEGER PRIMARY KEY, cluster TEXT NOT NULL, taken REAL NOT NULL,
+	secrets INTEGER, added INTEGER, updated INTEGER, deleted INTEGER, errors INTEGER
+);
+CREATE TABLE IF NOT EXISTS secrets (
+	cluster TEXT NOT NULL, path TEXT NOT NULL, version INTEGER,
+	created REAL, updated REAL, hash TEXT, PRIMARY KEY (cluster, path)
+);
+CREATE TABLE IF NOT EXISTS changes (
+	snapshot INTEGER NOT NULL, cluster TEXT NOT NULL, path TEXT NOT NULL, change TEXT NOT NULL, version INTEGER
+);
+CREATE INDEX IF NOT EXISTS changes_snapshot ON changes (cluster, snapshot);
+"""
+
+def catalog_open(db_file):
+	import sqlite3
+	os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+	db = sqlite3.connect(db_file)
+	db.execute("PRAGMA journal_mode=WAL")
+	db.executescript(CATALOG_SCHEMA)
+	return db
+
+def secret_hash(data):
+	return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+def format_vault_time(timestamp):
+	import datetime
+	if timestamp == None:
+		return None
+	return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+def catalog_refresh(db, name, args):
+	# Vault has no change feed, so every refresh lists the tree and reads metadata, but secret
+	# data is only read (for --hashes) when its version moved, and only changed rows are written
+	import time
+	from concurrent.futures import ThreadPoolExecutor
+	vault = cluster_client(name)
+	path_filter = compile_path_filter(args.include, args.exclude)
+	try:
+		engines = vault.sys.list_mounted_secrets_engines()['data']
+		mounts = [mp.strip('/') for mp, config in sorted(engines.items()) if config.get('type') == 'kv']
+	except hvac.exceptions.Forbidden:
+		print(f"Permission denied while getting secrets engines for {name} ")
+		mounts = [name]
+	mounts = [mp for mp in mounts if path_allowed(path_filter, f"{mp}/")]
+
+	def in_scope(path):
+		# Paths outside the walked mounts and filters are kept as they are, not marked deleted
+		parts = path.split('/')
+		if parts[0] not in mounts:
+			return False
+		for i in range(1, len(parts)):
+			if not path_allowed(path_filter, '/'.join(parts[:i]) + '/'):
+				return False
+		return path_allowed(path_filter, path)
+
+	known = {row[0]: row[1:] for row in db.execute("SELECT path, version, hash FROM secrets WHERE cluster = ?", (name,))}
+	wait = rate_limiter(args.rate)
+
+	def walk(mp):
+		with trace_span("walk", mount=mp):
+			return [path.lstrip('/') for path in list_all_recursive(vault, mount_point=mp, path_filter=path_filter)]
+
+	def inspect(path):
+		with trace_span("inspect", secret=path):
+			return inspect_secret(path)
+
+	def inspect_secret(path):
+		mnt, secret_path = parse_vault_path(path)
+		try:
+			wait()
+			metadata = vault.secrets.kv.v2.read_secret_metadata(mount_point=mnt, path=secret_path)['data']
+			version = metadata.get("current_version")
+			old = known.get(path)
+			digest = old[1] if old != None and old[0] == version else None
+			if args.hashes and digest == None:
+				wait()
+				data = vault.secrets.kv.v2.read_secret_version(mount_point=mnt, path=secret_path, raise_on_deleted_version=True)['data']['data']
+				digest = secret_hash(data)
+		except hvac.exceptions.InvalidPath:
+			return path, None
+		except Exception as e:
+			print(f"Error on {path}: {e}")
+			return path, False
+		return path, (version, parse_vault_time(metadata.get("created_time")), parse_vault_time(metadata.get("updated_time")), digest)
+
+	with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+		paths = [path for found in executor.map(walk, mounts) for path in found]
+		results = list(executor.map(inspect, paths))
+
+	snapshot = db.execute("INSERT INTO snapshots (cluster, taken) VALUES (?, ?)", (name, time.time())).lastrowid
+	counts = {"added": 0, "updated": 0, "deleted": 0}
+	rows = []
+	changes = []
+	seen = set()
+	errors = 0
+	for path, entry in results:
+		if entry == None:
+			continue
+		seen.add(path)
+		if entry == False:
+			errors += 1
+			continue
+		old = known.get(path)
+		if old == None or old[0] != entry[0]:
+			change = "added" if old == None else "updated"
+			counts[change] += 1
+			changes.append((snapshot, name, path, change, entry[0]))
+		elif old[1] == entry[3]:
+			continue
+		rows.append((name, path) + entry)
+	deleted = [path for path in known if path not in seen and in_scope(path)]
+	for path in deleted:
+		counts["deleted"] += 1
+		changes.append((snapshot, name, path, "deleted", known[path][0]))
+
+	db.executemany("INSERT OR REPLACE INTO secrets (cluster, path, version, created, updated, hash) VALUES (?, ?, ?, ?, ?, ?)", rows)
+	db.executemany("DELETE FROM secrets WHERE cluster = ? AND path = ?", [(name, path) for path in deleted])
+	db.executemany("INSERT INTO changes VALUES (?, ?, ?, ?, ?)", changes)
+	db.execute("UPDATE snapshots SET secrets = ?, added = ?, updated = ?, deleted = ?, errors = ? WHERE id = ?",
+		(len(seen), counts["added"], counts["updated"], counts["deleted"], errors, snapshot))
+	db.commit()
+	print(f"{name}: snapshot {snapshot}, {len(seen)} secrets, {counts['added']} added, {counts['updated']} updated, {counts['deleted']} deleted, {errors} errors")
+
+def catalog_query(db, args):
+	import datetime
+	clusters = args.src or [row[0] for row in db.execute("SELECT DISTINCT cluster FROM snapshots ORDER BY cluster")]
+	if args.action == "changed":
+		for name in clusters:
+			if args.since == None:
+				condition, value = "s.id = (SELECT MAX(id) FROM snapshots WHERE cluster = ?)", name
+			elif args.since.isdigit():
+				condition, value = "s.id > ?", int(args.since)
+			else:
+				since = datetime.datetime.fromisoformat(args.since)
+				if since.tzinfo == None:
+					since = since.replace(tzinfo=datetime.timezone.utc)
+				condition, value = "s.taken > ?", since.timestamp()
+			rows = db.execute(f"SELECT s.id, s.taken, c.path, c.change, c.version FROM changes c JOIN snapshots s ON s.id = c.snapshot WHERE c.cluster = ? AND {condition} ORDER BY s.id, c.path", (name, value))
+			for snapshot, taken, path, change, version in rows:
+				print(json.dumps({"cluster": name, "key": path, "change": change, "version": version, "snapshot": snapshot, "taken": format_vault_time(taken)}))
+		return
+
+	path_filter = None
+	prefix = args.prefix.lstrip('/')
+	if args.action == "search":
+		if not args.pattern:
+			print("--pattern is required for search")
+			sys.exit(1)
+		path_filter = compile_path_filter([args.pattern])
+		prefix = path_filter["include"][0][1] or ""
+	for name in clusters:
+		# Paths are the primary key, so a prefix is an index range scan
+		rows = db.execute("SELECT path, version, created, updated, hash FROM secrets WHERE cluster = ? AND path >= ? AND path < ? ORDER BY path", (name, prefix, prefix + "\U0010ffff"))
+		for path, version, created, updated, digest in rows:
+			if path_allowed(path_filter, path):
+				print(json.dumps({"cluster": name, "key": path, "version": version, "created": format_vault_time(created), "updated": format_vault_time(updated), "hash": digest}))
+
+def handle_catalog(args):
+	db = catalog_open(args.db)
+	if args.action == "refresh":
+		if not args.src:
+			print("--src is required for refresh")
+			sys.exit(1)
+		import_vault_modules()
+		for name in args.src:
+			catalog_refresh(db, name, args)
+	else:
+		catalog_query(db, args)
+
+# ============ Directory writer ============
+
+WRITER_WORKERS = 16
+
+def write_structure(files, root, workers=WRITER_WORKERS):
+	# files maps paths relative to root to their content. The new tree is staged next to root
+	# and swapped in with two renames, so readers never see a half written backup. Files of the
+	# previous tree are hard linked into the staging tree (kept as before when no longer backed
+	# up), and only files whose content changed are written.
+	import shutil
+	import time
+	from concurrent.futures import ThreadPoolExecutor
+	start = time.perf_counter()
+	root = os.path.abspath(root)
+	staging = f"{root}.tmp-{os.getpid()}"
+	previous = f"{root}.old-{os.getpid()}"
+	shutil.rmtree(staging, ignore_errors=True)
+	existing = {}
+	if os.path.isdir(root):
+		for dirpath, dirnames, filenames in os.walk(root):
+			for name in filenames:
+				full_path = os.path.join(dirpath, name)
+				existing[os.path.relpath(full_path, root)] = full_path
+	made = set()
+
+	def makedirs(directory):
+		if directory not in made:
+			os.makedirs(directory, exist_ok=True)
+			made.add(directory)
+
+	def place(rel_path):
+		target = os.path.join(staging, rel_path)
+		makedirs(os.path.dirname(target))
+		old_file = existing.get(rel_path)
+		data = files[rel_path].encode() if rel_path in files else None
+		if old_file != None:
+			if data != None and os.path.getsize(old_file) == len(data):
+				with open(old_file, "rb") as f:
+					unchanged = f.read() == data
+			else:
+				unchanged = data == None
+			if unchanged:
+				try:
+					os.link(old_file, target)
+				except OSError:
+					shutil.copy2(old_file, target)
+				return "unchanged" if data != None else "kept"
+		with open(target, "wb") as f:
+			f.write(data)
+		return "written"
+
+	counts = {"written": 0, "unchanged": 0, "kept": 0}
+	try:
+		os.makedirs(staging)
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			for result in executor.map(place, set(files) | set(existing)):
+				counts[result] += 1
+		if os.path.isdir(root):
+			os.rename(root, previous)
+		os.rename(staging, root)
+	except BaseException:
+		# Failed between the two renames: the previous tree goes back before the staged one is dropped
+		if os.path.isdir(previous) and not os.path.exists(root):
+			os.rename(previous, root)
+		shutil.rmtree(staging, ignore_errors=True)
+		raise
+	shutil.rmtree(previous, ignore_errors=True)
+	print(f"{root}: {counts['written']} files written, {counts['unchanged']} unchanged, {counts['kept']} kept from earlier backups, {len(made)} directories, {time.perf_counter() - start:.1f}s")
+	return counts
+
+# ============ Incremental backup ============
+
+def backup_store_dir(args):
+	return os.path.join(args.dir, f"{args.src}.incremental")
+
+def lock_backup_store(store):
+	# Backups and GC of the same store never overlap, so GC cannot drop objects of a running backup
+	import fcntl
+	# The store holds secret payloads in clear, so only the owner may enter it
+	os.makedirs(store, mode=0o700, exist_ok=True)
+	os.chmod(store, 0o700)
+	os.makedirs(os.path.join(store, "manifests"), exist_ok=True)
+	lock = open(os.path.join(store, ".lock"), "w")
+	fcntl.flock(lock, fcntl.LOCK_EX)
+	return lock
+
+def list_backup_manifests(store):
+	manifest_dir = os.path.join(store, "manifests")
+	if not os.path.isdir(manifest_dir):
+		return []
+	return sorted(name for name in os.listdir(manifest_dir) if name.endswith(".json.gz"))
+
+def read_backup_manifest(store, name):
+	import gzip
+	with gzip.open(os.path.join(store, "manifests", name), "rt") as f:
+		return json.load(f)
+
+def backup_object_path(store, digest):
+	return os.path.join(store, "objects", digest[:2], digest)
+
+def read_backup_store(store, name="latest"):
+	# Rebuilds the secrets of one manifest in list_secrets' shape, so make_structure can lay them out
+	manifests = list_backup_manifests(store)
+	if not manifests:
+		print(f"No manifests in {store}")
+		sys.exit(1)
+	if name == "latest":
+		name = manifests[-1]
+	elif not name.endswith(".json.gz"):
+		name += ".json.gz"
+	if name not in manifests:
+		print(f"Manifest {name} not found in {store}")
+		sys.exit(1)
+	# Hold the store lock so a concurrent GC cannot drop objects while they are read
+	lock = lock_backup_store(store)
+	secrets = []
+	for path, entry in sorted(read_backup_manifest(store, name)["secrets"].items()):
+		object_file = backup_object_path(store, entry["object"])
+		if not os.path.exists(object_file):
+			print(f"Object {entry['object']} of {path} is missing from {store}")
+			sys.exit(1)
+		with open(object_file, "rb") as f:
+			secrets.append({"key": f"/{path}", "data": json.loads(f.read())})
+	lock.close()
+	print(f"Restoring {len(secrets)} secrets from manifest {name}")
+	return secrets
+
+def write_file_atomic(file, data):
+	import threading
+	with trace_span("file write", "io", bytes=len(data)):
+		os.makedirs(os.path.dirname(file), exist_ok=True)
+		tmp_file = f"{file}.tmp.{os.getpid()}.{threading.get_ident()}"
+		try:
+			with os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+				f.write(data)
+			os.replace(tmp_file, file)
+		except BaseException:
+			if os.path.exists(tmp_file):
+				os.remove(tmp_file)
+			raise
+
+def incremental_backup(args):
+	# Every secret payload is stored once under its SHA-256, and a run only writes a manifest of
+	# path -> version/object; secrets whose version did not move since the last run are not read
+	import gzip
+	import time
+	from concurrent.futures import ThreadPoolExecutor
+	store = backup_store_dir(args)
+	lock = lock_backup_store(store)
+	manifests = list_backup_manifests(store)
+	previous = read_backup_manifest(store, manifests[-1])["secrets"] if manifests else {}
+	with trace_span("walk"):
+		secrets_keys = [key.lstrip('/') for key in list_keys(args)]
+
+	def backup_secret(path):
+		with trace_span("backup secret", secret=path):
+			return store_secret(path)
+
+	def store_secret(path):
+		mnt, secret_path = parse_vault_path(path)
+		old = previous.get(path)
+		try:
+			version = client.secrets.kv.v2.read_secret_metadata(mount_point=mnt, path=secret_path)['data'].get("current_version")
+			if old != None and old["version"] == version and os.path.exists(backup_object_path(store, old["object"])):
+				return path, old, "unchanged"
+			data = client.secrets.kv.v2.read_secret_version(mount_point=mnt, path=secret_path, raise_on_deleted_version=True)['data']['data']
+		except hvac.exceptions.InvalidPath:
+			return path, None, "gone"
+		except Exception as e:
+			# Keep the last good copy rather than dropping the secret from this run
+			print(f"Error on {path}: {e}")
+			return path, old, "error"
+		payload = json.dumps(data, sort_keys=True).encode()
+		digest = hashlib.sha256(payload).hexdigest()
+		object_file = backup_object_path(store, digest)
+		if os.path.exists(object_file):
+			return path, {"version": version, "object": digest}, "read"
+		write_file_atomic(object_file, payload)
+		return path, {"version": version, "object": digest}, "stored"
+
+	entries = {}
+	counts = {"unchanged": 0, "read": 0, "stored": 0, "gone": 0, "error": 0}
+	with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+		for path, entry, outcome in executor.map(backup_secret, secrets_keys):
+			counts[outcome] += 1
+			if entry != None:
+				entries[path] = entry
+	name = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + ".json.gz"
+	manifest = {"cluster": args.src, "created": format_vault_time(time.time()), "secrets": entries}
+	write_file_atomic(os.path.join(store, "manifests", name), gzip.compress(json.dumps(manifest, sort_keys=True).encode()))
+	print(f"Backup {name}: {len(entries)} secrets, {counts['unchanged']} unchanged, {counts['read'] + counts['stored']} read, {counts['stored']} new objects, {counts['error']} errors")
+	if args.keep != None:
+		gc_backup_store(store, args.keep)
+	lock.close()
+	if counts["error"]:
+		sys.exit(1)
+
+def gc_backup_store(store, keep=None):
+	# Drops manifests beyond the newest `keep`, then every object no remaining manifest references
+	manifests = list_backup_manifests(store)
+	if keep != None:
+		for name in manifests[:-keep]:
+			os.remove(os.path.join(store, "manifests", name))
+		manifests = manifests[-keep:]
+	referenced = set()
+	for name in manifests:
+		referenced.update(entry["object"] for entry in read_backup_manifest(store, name)["secrets"].values())
+	removed = 0
+	freed = 0
+	for root, dirs, files in os.walk(os.path.join(store, "objects")):
+		for file in files:
+			if file not in referenced:
+				freed += os.path.getsize(os.path.join(root, file))
+				os.remove(os.path.join(root, file))
+				removed += 1
+	print(f"GC: {len(manifests)} manifests kept, {removed} objects removed, {freed} bytes freed")
+
+# ============ Backup archive pipeline ============
+
+ARCHIVE_MAGIC = b"VBAK2\n"
+# Every frame is tagged as a chunk or as the trailer, which holds the chunk count and ends the archive
+FRAME_CHUNK = b"C"
+FRAME_TRAILER = b"T"
+
+def load_backup_key(key_file):
+	# 32 byte AES-256 key, hex or base64 encoded, e.g. from `openssl rand -hex 32`
+	import base64
+	import binascii
+	try:
+		import cryptography.hazmat.primitives.ciphers.aead
+	except ImportError:
+		print("Encryption needs the cryptography package: pip install cryptography")
+		sys.exit(1)
+	with open(key_file) as f:
+		text = f.read().strip()
+	try:
+		key = bytes.fromhex(text)
+	except ValueError:
+		try:
+			key = base64.b64decode(text, validate=True)
+		except binascii.Error:
+			key = b""
+	if len(key) != 32:
+		print(f"{key_file} must hold a 32 byte key, hex or base64 encoded")
+		sys.exit(1)
+	return key
+
+def ordered_map(executor, func, items, window):
+	# Like executor.map, but with at most `window` items in flight: a slow consumer stalls the
+	# producer instead of piling results up in memory, and results keep the input order
+	from collections import deque
+	window = max(1, window)
+	pending = deque()
+	for item in items:
+		if len(pending) >= window:
+			yield pending.popleft().result()
+		pending.append(executor.submit(func, item))
+	while pending:
+		yield pending.popleft().result()
+
+def frame_aad(header_digest, kind, index):
+	# The archive header, frame kind and position are authenticated with every frame, so frames
+	# cannot be reordered, taken from another archive or passed off as the trailer
+	return header_digest + kind + index.to_bytes(8, "big")
+
+def seal_chunk(task):
+	# Runs in a worker process
+	import zlib
+	index, payload, level, key, header_digest, kind = task
+	data = zlib.compress(payload, level)
+	if key == None:
+		return data
+	from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+	nonce = os.urandom(12)
+	return nonce + AESGCM(key).encrypt(nonce, data, frame_aad(header_digest, kind, index))
+
+def open_chunk(index, frame, key, header_digest, kind):
+	import zlib
+	if key != None:
+		from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+		frame = AESGCM(key).decrypt(frame[:12], frame[12:], frame_aad(header_digest, kind, index))
+	return zlib.decompress(frame)
+
+def read_secret_entry(secret):
+	# None for a secret deleted since the walk, which the archive skips like incremental_backup does
+	mnt, path = parse_vault_path(secret)
+	with trace_span("read", secret=secret):
+		try:
+			response = client.secrets.kv.v2.read_secret_version(path=path, mount_point=mnt, raise_on_deleted_version=True)
+		except hvac.exceptions.InvalidPath:
+			return None
+	return {"key": secret, "data": response['data']['data']}
+
+def backup_chunks(entries, chunk_secrets, counts):
+	chunk = []
+	for entry in entries:
+		if entry == None:
+			counts["gone"] += 1
+			continue
+		chunk.append(json.dumps(entry))
+		if len(chunk) == chunk_secrets:
+			yield ("\n".join(chunk) + "\n").encode()
+			chunk = []
+	if chunk:
+		yield ("\n".join(chunk) + "\n").encode()
+
+def write_backup_archive(archive, secrets_keys, args, key):
+	# Vault reads run on a thread pool, compression and encryption on a process pool; both
+	# stages are bounded, and frames are written in secret order whatever finishes first
+	import multiprocessing
+	from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+	processes = args.processes or os.cpu_count() or 1
+	header = json.dumps({"compression": "zlib", "encryption": "aes-256-gcm" if key != None else None, "cluster": args.src}).encode()
+	header_digest = hashlib.sha256(header).digest()
+	tmp_file = f"{archive}.{os.getpid()}"
+	frames = 0
+	counts = {"gone": 0}
+	try:
+		with ThreadPoolExecutor(max_workers=max(1, args.workers)) as readers, \
+				ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as sealers, \
+				os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as out:
+			out.write(ARCHIVE_MAGIC + header + b"\n")
+			entries = ordered_map(readers, read_secret_entry, secrets_keys, args.workers * 4)
+			tasks = ((index, chunk, args.compress_level, key, header_digest, FRAME_CHUNK) for index, chunk in enumerate(backup_chunks(entries, args.chunk_secrets, counts)))
+			for frame in ordered_map(sealers, seal_chunk, tasks, processes * 2):
+				with trace_span("write chunk", "io", bytes=len(frame)):
+					out.write(FRAME_CHUNK + len(frame).to_bytes(4, "big"))
+					out.write(frame)
+				frames += 1
+			trailer = seal_chunk((frames, json.dumps({"frames": frames}).encode(), args.compress_level, key, header_digest, FRAME_TRAILER))
+			out.write(FRAME_TRAILER + len(trailer).to_bytes(4, "big") + trailer)
+		os.replace(tmp_file, archive)
+	finally:
+		# A failed run leaves no partial archive behind
+		if os.path.exists(tmp_file):
+			os.remove(tmp_file)
+	print(f"Archive {archive}: {len(secrets_keys) - counts['gone']} secrets in {frames} chunks, {counts['gone']} gone since the walk, {os.path.getsize(archive)} bytes")
+
+def read_backup_archive(archive, key):
+	with open(archive, "rb") as f:
+		if f.readline() != ARCHIVE_MAGIC:
+			print(f"{archive} is not a backup archive")
+			sys.exit(1)
+		header_line = f.readline().rstrip(b"\n")
+		header_digest = hashlib.sha256(header_line).digest()
+		header = json.loads(header_line)
+		if header.get("encryption") and key == None:
+			print(f"{archive} is encrypted, pass --encrypt-key-file")
+			sys.exit(1)
+		key = key if header.get("encryption") else None
+		index = 0
+		while True:
+			# Nothing is yielded past a frame that fails to open, and the archive only counts
+			# as complete once the trailer confirms every chunk was read
+			kind = f.read(1)
+			if kind not in (FRAME_CHUNK, FRAME_TRAILER):
+				print(f"{archive} is truncated or corrupt: no valid frame after chunk {index}")
+				sys.exit(1)
+			size = int.from_bytes(f.read(4), "big")
+			try:
+				data = open_chunk(index, f.read(size), key, header_digest, kind)
+			except Exception as e:
+				print(f"{archive} is truncated or corrupt at chunk {index}: {type(e).__name__} {e}")
+				sys.exit(1)
+			if kind == FRAME_TRAILER:
+				if json.loads(data).get("frames") != index or f.read(1):
+					print(f"{archive} is corrupt: trailer does not match the {index} chunks read")
+					sys.exit(1)
+				return
+			for line in data.splitlines():
+				yield json.loads(line)
+			index += 1
 
 def check_type_files(type,actions):
 	import_files = []
@@ -276,53 +1886,101 @@ def check_type_files(type,actions):
 						import_files.append(task["conf"])
 	return import_files
 
-def handle_import(args):
-	global final_structure
-	global mount_point
+import_pattern = r'/ns/([^/]+)/(?:secret|tls-secret)/([^ ]+)/([^ ]+)'
 
-	client(args)	
-	pattern = r'/ns/([^/]+)/(?:secret|tls-secret)/([^ ]+)/([^ ]+)'
+def collect_import_items(args):
+	global final_structure
 	secrets_data = [] 
+	import_roots = []
 	cluster_name = ""
-	grouped_secrets = {} 
 
 	# Get all files and check if type import exists
 	actions = list(final_structure.get("vault_cfg").get("actions").keys())
 	import_files = check_type_files('import',actions)
 
 	# Check if target match
+	seen_items = set()
 	for file in import_files:
 		path_list = []
+		seen_paths = set()
 		if os.path.isfile(file) == False:
 			print("File does not exists")
 			exit(1)
-		with open(file) as f:
-			parsed_yaml_file = yaml.safe_load(f)
+		parsed_yaml_file = read_yaml(file)
 		if parsed_yaml_file['kind'] == 'import' and args.src == parsed_yaml_file['target'].split('/')[0]:
 			cluster_name = parsed_yaml_file['target'].split('/',1)[1] if len(parsed_yaml_file['target'].split('/',1)) > 1 else args.src 
 			for cert in parsed_yaml_file["secrets"]["paths"]:
 				clean_path = cert.rstrip("*")
+				import_roots.append((clean_path, cluster_name))
 				search_pattern = os.path.join(clean_path, "**/*")
 				found_items = glob.glob(search_pattern, recursive=True)
 				for item in found_items:
 					if not os.path.isdir(item):
-						if item not in path_list:
+						if item not in seen_paths:
+							seen_paths.add(item)
 							path_list.append(item)
 				for path in path_list:
-					match = re.search(pattern,path)
+					match = re.search(import_pattern,path)
 					ns = match.group(1)
 					secret_name = match.group(2)
 					secret_key = match.group(3)
 					value = {"ns": ns,"secret_name": secret_name,"secret_key": secret_key,"secret_data_file": path,"cluster": cluster_name}
-					if value not in secrets_data:
+					if (ns, secret_name, secret_key, path, cluster_name) not in seen_items:
+						seen_items.add((ns, secret_name, secret_key, path, cluster_name))
 						secrets_data.append(value)
-#       Import certs	
-	
+	return secrets_data, import_roots
+
+def file_stat_key(file):
+	st = os.stat(file)
+	return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+def load_import_manifest(src):
+	# files: path -> ((size, mtime_ns, inode), content sha256)
+	# secrets: "cluster|ns/secret_name" -> sorted [(secret_key, path)]
+	# payloads: "cluster|ns/secret_name" -> sha256 of the last payload written
+	manifest = state_load(f"import-{src}", {"files": {}, "secrets": {}, "payloads": {}})
+	# JSON has no tuples, restore them for the comparisons in filter_unchanged_import_items
+	manifest["files"] = {path: (tuple(stat_key), digest) for path, (stat_key, digest) in manifest["files"].items()}
+	manifest["secrets"] = {key: [tuple(entry) for entry in entries] for key, entries in manifest["secrets"].items()}
+	return manifest
+
+def save_import_manifest(src, manifest):
+	state_save(f"import-{src}", manifest)
+
+def filter_unchanged_import_items(secrets_data, manifest):
+	# Drop every secret whose files are the same set with the same stat as when it was last written
+	by_secret = {}
+	for item in secrets_data:
+		by_secret.setdefault(f"{item['cluster']}|{item['ns']}/{item['secret_name']}", []).append(item)
+	changed = []
+	skipped = 0
+	for key, items in by_secret.items():
+		unchanged = key in manifest["payloads"] and manifest["secrets"].get(key) == sorted((item['secret_key'], item['secret_data_file']) for item in items)
+		if unchanged:
+			for item in items:
+				try:
+					if manifest["files"].get(item['secret_data_file'], (None,))[0] != file_stat_key(item['secret_data_file']):
+						unchanged = False
+						break
+				except OSError:
+					unchanged = False
+					break
+		if unchanged:
+			skipped += 1
+		else:
+			changed.extend(items)
+	return changed, skipped
+
+def group_import_items(secrets_data):
+	# sources: "cluster|ns/secret_name" -> [(secret_key, path, manifest file entry)], committed once the secret is written
+	grouped_secrets = {} 
+	sources = {}
 	for item in secrets_data:
 		vault_path = f"{item['ns']}/{item['secret_name']}"
 		cluster = item['cluster'] #Check default with thomas
 		try:
 			with open(item['secret_data_file'],'r') as f:
+				stat_key = file_stat_key(item['secret_data_file'])
 				secret_value = f.read().strip()
 		except Exception as e: 
 			print(f"Error in the file: {item['secret_data_file']} {e}")
@@ -331,23 +1989,353 @@ def handle_import(args):
 			grouped_secrets[cluster] = {}
 		if vault_path not in grouped_secrets[cluster]:
 			grouped_secrets[cluster][vault_path] = {}
+		sources.setdefault(f"{cluster}|{vault_path}", []).append((item['secret_key'], item['secret_data_file'], (stat_key, hashlib.sha256(secret_value.encode()).hexdigest())))
 		grouped_secrets[cluster][vault_path][item['secret_key']] = secret_value
+	return grouped_secrets, sources
+
+def commit_import_secret(manifest, manifest_key, sources, payload_hash):
+	# Only a secret that reached Vault (or already held this payload) is recorded as unchanged
+	for secret_key, path, file_entry in sources:
+		manifest["files"][path] = file_entry
+	manifest["secrets"][manifest_key] = sorted((secret_key, path) for secret_key, path, file_entry in sources)
+	manifest["payloads"][manifest_key] = payload_hash
 
+def import_secret_location(cluster, v_path):
+	# cluster is "<mount>" or "<mount>/<prefix>", the secret lives at <prefix>/<ns>/<secret_name> on the mount
+	parts = cluster.split('/',1)
+	if len(parts) > 1 and parts[1]:
+		v_path = os.path.join(parts[1], v_path)
+	return parts[0], v_path
+
+def write_import_secrets(grouped_secrets, manifest=None, sources=None):
+	global mount_point
+	written = 0
 	for cluster, secrets_dict in grouped_secrets.items():
 		for v_path, secret_data in secrets_dict.items():
 			if cluster in (""," "):
 				print("No secret engine specified, please fix your yaml")
 				exit(1)	
+			manifest_key = f"{cluster}|{v_path}"
+			payload_hash = hashlib.sha256(json.dumps(secret_data, sort_keys=True).encode()).hexdigest()
+			if manifest != None and manifest["payloads"].get(manifest_key) == payload_hash:
+				commit_import_secret(manifest, manifest_key, sources[manifest_key], payload_hash)
+				continue
 			print(f"  -> Writing {v_path} Keys: {list(secret_data.keys())} on {cluster}")
-			parts = cluster.split('/',1)
-			if len(parts) > 1 and parts[1]:
-				v_path = os.path.join(parts[1], v_path)
-			tmp_parts = parts[0] if parts[0].endswith('/') else f"{parts[0]}/"
+			mnt, v_path = import_secret_location(cluster, v_path)
+			tmp_parts = mnt if mnt.endswith('/') else f"{mnt}/"
 			if(tmp_parts not in mount_point):
 				client.sys.enable_secrets_engine(backend_type='kv',options={'version': '2'},path=tmp_parts)
 				response = client.sys.list_mounted_secrets_engines()['data']
 				mount_point = (sorted(response.keys()))
-			client.secrets.kv.v2.create_or_update_secret(mount_point=parts[0] ,path=v_path,secret=secret_data)
+			with trace_span("write", secret=f"{mnt}/{v_path}"):
+				client.secrets.kv.v2.create_or_update_secret(mount_point=mnt ,path=v_path,secret=secret_data)
+			written += 1
+			if manifest != None:
+				commit_import_secret(manifest, manifest_key, sources[manifest_key], payload_hash)
+	return written
+
+def handle_import(args):
+	client(args)	
+	with trace_span("walk files"):
+		secrets_data, import_roots = collect_import_items(args)
+	manifest = {"files": {}, "secrets": {}, "payloads": {}} if args.force else load_import_manifest(args.src)
+	changed_items, skipped = filter_unchanged_import_items(secrets_data, manifest)
+	if skipped:
+		print(f"Skipped {skipped} unchanged secrets")
+	try:
+		grouped_secrets, sources = group_import_items(changed_items)
+		write_import_secrets(grouped_secrets, manifest, sources)
+	finally:
+		save_import_manifest(args.src, manifest)
+	if args.watch:
+		watch_import(secrets_data, import_roots, args.debounce, args.poll_interval, manifest, args.src, args.propagate_deletes)
+
+# ============ Import watch mode ============
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+def inotify_source(roots):
+	import ctypes
+	import ctypes.util
+	import select
+	import struct
+	libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+	fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+	if fd < 0:
+		raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+	watch_mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+	watches = {}
+
+	def add_tree(top):
+		for dirpath, dirnames, filenames in os.walk(top):
+			wd = libc.inotify_add_watch(fd, os.fsencode(dirpath), watch_mask)
+			if wd < 0:
+				raise OSError(ctypes.get_errno(), f"inotify_add_watch failed on {dirpath}")
+			watches[wd] = dirpath
+
+	for root in roots:
+		add_tree(root)
+
+	def read(timeout):
+		changed = set()
+		if not select.select([fd], [], [], timeout)[0]:
+			return changed
+		data = os.read(fd, 1 << 16)
+		offset = 0
+		while offset < len(data):
+			wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+			name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+			offset += 16 + length
+			if mask & IN_Q_OVERFLOW:
+				# Kernel queue overflowed, everything under the roots has to be rechecked
+				changed.update(roots)
+				continue
+			if mask & IN_IGNORED:
+				watches.pop(wd, None)
+				continue
+			if wd not in watches:
+				continue
+			path = os.path.join(watches[wd], name)
+			if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+				add_tree(path)
+			changed.add(path)
+		return changed
+	return read
+
+def poll_source(roots, interval):
+	import time
+
+	def snapshot():
+		state = {}
+		for root in roots:
+			for dirpath, dirnames, filenames in os.walk(root):
+				for filename in filenames:
+					path = os.path.join(dirpath, filename)
+					try:
+						st = os.stat(path)
+					except OSError:
+						continue
+					state[path] = (st.st_mtime_ns, st.st_size)
+		return state
+
+	last = {"state": snapshot(), "time": time.monotonic()}
+
+	def read(timeout):
+		remaining = last["time"] + interval - time.monotonic()
+		if remaining > 0:
+			time.sleep(remaining if timeout == None else min(remaining, timeout))
+			if time.monotonic() < last["time"] + interval:
+				return set()
+		state = snapshot()
+		previous = last["state"]
+		changed = {p for p in state if previous.get(p) != state[p]}
+		changed.update(p for p in previous if p not in state)
+		last["state"] = state
+		last["time"] = time.monotonic()
+		return changed
+	return read
+
+def watch_changes(roots, debounce, poll_interval, retry_at=None):
+	# Yields debounced sets of changed paths, and an empty set once retry_at() (monotonic time or None) is due
+	import time
+	try:
+		read = inotify_source(roots)
+		print(f"Watching {len(roots)} path(s) with inotify")
+	except (OSError, AttributeError) as e:
+		print(f"inotify not available ({e}), polling every {poll_interval}s")
+		read = poll_source(roots, poll_interval)
+	pending = set()
+	deadline = 0
+	while True:
+		due = retry_at() if retry_at != None else None
+		wake = [at for at in ([deadline] if pending else []) + [due] if at != None]
+		timeout = max(0, min(wake) - time.monotonic()) if wake else None
+		changed = read(timeout)
+		if changed:
+			pending.update(changed)
+			deadline = time.monotonic() + debounce
+		elif pending and time.monotonic() >= deadline:
+			yield pending
+			pending = set()
+		elif due != None and time.monotonic() >= due:
+			yield set()
+
+def remove_import_secret(cluster, v_path, manifest, delete):
+	# Every source file of the secret is gone: forget it, and with delete remove it from Vault too
+	mnt, path = import_secret_location(cluster, v_path)
+	if delete:
+		client.secrets.kv.v2.delete_metadata_and_all_versions(mount_point=mnt, path=path)
+		print(f"  -> Deleted {mnt}/{path}, its source files were removed")
+	else:
+		print(f"  -> Source files of {mnt}/{path} were removed, the secret is left in Vault (--propagate-deletes removes it)")
+	manifest_key = f"{cluster}|{v_path}"
+	for secret_key, file in manifest["secrets"].pop(manifest_key, []):
+		manifest["files"].pop(file, None)
+	manifest["payloads"].pop(manifest_key, None)
+
+# Backoff of a failed watch batch, doubled per failure in a row
+WATCH_RETRY_DELAY = 5
+WATCH_RETRY_MAX_DELAY = 300
+
+def watch_import(secrets_data, import_roots, debounce, poll_interval, manifest, src, delete=False):
+	import time
+	# (cluster, "ns/secret_name") -> {secret_key: file}, the same grouping handle_import writes
+	secret_files = {}
+	for item in secrets_data:
+		secret_files.setdefault((item['cluster'], f"{item['ns']}/{item['secret_name']}"), {})[item['secret_key']] = item['secret_data_file']
+	roots = sorted(import_roots, key=lambda root: len(root[0]), reverse=True)
+	# Secrets of a batch that failed, imported again with the next batch or once their backoff ran out
+	retry = {"keys": set(), "failures": 0, "at": None}
+	try:
+		for changed in watch_changes([root for root, cluster in import_roots], debounce, poll_interval, lambda: retry["at"] if retry["keys"] else None):
+			paths = set()
+			for path in changed:
+				if os.path.isdir(path):
+					for dirpath, dirnames, filenames in os.walk(path):
+						paths.update(os.path.join(dirpath, filename) for filename in filenames)
+				prefix = path.rstrip('/') + '/'
+				for files in secret_files.values():
+					paths.update(file for file in files.values() if file == path or file.startswith(prefix))
+				if not os.path.isdir(path):
+					paths.add(path)
+			affected = set()
+			for path in paths:
+				if os.path.basename(path).startswith('.'):
+					continue
+				match = re.search(import_pattern, path)
+				cluster = next((cluster for root, cluster in roots if path.startswith(root)), None)
+				if not match or cluster == None:
+					continue
+				key = (cluster, f"{match.group(1)}/{match.group(2)}")
+				files = secret_files.setdefault(key, {})
+				if os.path.isfile(path):
+					files[match.group(3)] = path
+				elif files.get(match.group(3)) == path:
+					del files[match.group(3)]
+				affected.add(key)
+			affected |= retry["keys"]
+			retry["keys"] = set()
+			changed_secrets = [{"cluster": cluster, "ns": v_path.split('/', 1)[0], "secret_name": v_path.split('/', 1)[1], "secret_key": secret_key, "secret_data_file": file}
+				for cluster, v_path in sorted(affected)
+				for secret_key, file in secret_files.get((cluster, v_path), {}).items()]
+			# Secrets left without files, those never imported (e.g. a temporary file) are just forgotten
+			removed = [key for key in sorted(affected) if not secret_files.get(key) and f"{key[0]}|{key[1]}" in manifest["secrets"]]
+			for key in affected:
+				if not secret_files.get(key) and key not in removed:
+					secret_files.pop(key, None)
+			if not changed_secrets and not removed:
+				continue
+			print(f"Changes detected, re-importing {len(affected)} secret(s)" if changed else f"Retrying {len(affected)} secret(s)")
+			try:
+				grouped_secrets, sources = group_import_items(changed_secrets)
+				write_import_secrets(grouped_secrets, manifest, sources)
+				for cluster, v_path in removed:
+					remove_import_secret(cluster, v_path, manifest, delete)
+					secret_files.pop((cluster, v_path), None)
+				retry["failures"] = 0
+			except Exception as e:
+				# Keep watching, what was not written is tried again with the next batch or after a backoff
+				retry["failures"] += 1
+				delay = min(WATCH_RETRY_MAX_DELAY, WATCH_RETRY_DELAY * 2 ** (retry["failures"] - 1))
+				retry["keys"] = affected
+				retry["at"] = time.monotonic() + delay
+				print(f"Error importing changes, retrying in {delay}s: {type(e).__name__} {e}")
+			finally:
+				save_import_manifest(src, manifest)
+	except KeyboardInterrupt:
+		print("Watch stopped")
+
+# ============ Profiling ============
+
+def start_profiler(interval):
+	# The sampler lives in the GUI's core/profiler.py, so the CLI and the GUI profile the same way
+	profiler = load_core_module("profiler").SamplingProfiler(interval)
+	profiler.start()
+	return profiler
+
+def stop_profiler(profiler, prefix, top):
+	summary = profiler.stop(prefix, top)
+	print(profiler.summary_text(summary), file=sys.stderr)
+	print(f"Profile written to {prefix}.wall.folded, .cpu.folded and .summary.txt", file=sys.stderr)
+	return summary
+
+# ============ Tracing ============
+
+def start_tracer(trace_file, sample, max_events=1000000):
+	import threading
+	import time
+	global tracer
+	tracer = {"file": trace_file, "sample": sample, "max_events": max_events, "events": [], "threads": {},
+		"dropped": 0, "lock": threading.Lock(), "local": threading.local(), "origin": time.perf_counter()}
+	if hvac != None:
+		trace_vault_calls()
+
+@contextlib.contextmanager
+def trace_span(name, category="stage", **span_args):
+	# Spans nest per thread, and the outermost span of a thread decides whether it and
+	# everything below it is recorded, so a sample rate below 1 keeps whole call trees.
+	# The command span is always recorded and left out of the nesting, so the stages
+	# below it are sampled one by one instead of the whole run at once.
+	if tracer == None:
+		yield
+		return
+	import random
+	import threading
+	import time
+	local = tracer["local"]
+	depth = getattr(local, "depth", 0)
+	is_command = category == "command"
+	if depth == 0 and not is_command:
+		local.sampled = random.random() < tracer["sample"]
+	local.depth = depth if is_command else depth + 1
+	start = time.perf_counter() if is_command or local.sampled else None
+	try:
+		yield
+	finally:
+		local.depth = depth
+		if start != None:
+			end = time.perf_counter()
+			tid = threading.get_native_id()
+			event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": tid,
+				"ts": round((start - tracer["origin"]) * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+			if span_args:
+				event["args"] = span_args
+			with tracer["lock"]:
+				if len(tracer["events"]) < tracer["max_events"]:
+					tracer["events"].append(event)
+					tracer["threads"][tid] = threading.current_thread().name
+				else:
+					tracer["dropped"] += 1
+
+def trace_vault_calls():
+	# Every hvac client sends its requests through RawAdapter.request, patching it once covers them all
+	adapters = getattr(hvac, "adapters", None)
+	if adapters == None or getattr(adapters.RawAdapter.request, "traced", False):
+		return
+	request = adapters.RawAdapter.request
+
+	def traced_request(self, method, url, *args, **kwargs):
+		with trace_span(f"{method.upper()} {url}", "vault"):
+			return request(self, method, url, *args, **kwargs)
+	traced_request.traced = True
+	adapters.RawAdapter.request = traced_request
+
+def write_trace():
+	# Chrome trace-event JSON, opens in Perfetto (ui.perfetto.dev) or chrome://tracing
+	events = list(tracer["events"])
+	for tid, name in tracer["threads"].items():
+		events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}})
+	with open(tracer["file"], "w") as f:
+		json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+			"otherData": {"sample": tracer["sample"], "dropped": tracer["dropped"]}}, f)
+	print(f"Trace written to {tracer['file']}: {len(tracer['events'])} spans, {tracer['dropped']} dropped", file=sys.stderr)
 
 
 def merge_structure(file):
@@ -361,33 +2349,156 @@ def merge_structure(file):
 			else:
 				base_dict[key] = value
 		return base_dict
-	with open(file) as f:
-		main_conf = yaml.safe_load(f)
+	entry = cache_get("config")
+	if entry != None and entry["signature"][0][0] == os.path.abspath(file):
+		# Tokens are never cached, they are read again from the files that hold them
+		final_structure = entry["data"]["structure"]
+		for token_file in entry["data"]["token_files"]:
+			for name, token in cluster_tokens(read_yaml(token_file)).items():
+				final_structure["vault_cfg"]["clusters"].setdefault(name, {})["token"] = token
+		return
+	main_conf = read_yaml(file)
 	files_to_merge = main_conf.get('conf',[])
+	token_files = []
 	for file_path in files_to_merge:
-		with open(file_path) as file:
-			current_data = yaml.safe_load(file)
+		current_data = read_yaml(file_path)
+		if cluster_tokens(current_data):
+			token_files.append(file_path)
 		deep_merge(base_dict=final_structure,update_dict=current_data)
+	import copy
+	structure = copy.deepcopy(final_structure)
+	for cluster in ((structure.get("vault_cfg") or {}).get("clusters") or {}).values():
+		if isinstance(cluster, dict):
+			cluster.pop("token", None)
+	cache_put("config", [file] + files_to_merge, {"structure": structure, "token_files": token_files})
+
+def handle_nodes(args):
+	if args.file:
+		nodes = cluster_names_cached(args.file)
+	else:
+		merge_structure(main_config_file)
+		nodes = final_structure.get("vault_cfg",{}).get("clusters",{}).keys()
+	for node in nodes:
+		print(node)
 
 
-merge_structure(main_config_file)
 parser = argparse.ArgumentParser(description="HashiCorp Vault Tool")
 subparsers = parser.add_subparsers(dest='command', required=True, help='Available commands')
 parser_backup = subparsers.add_parser('backup', help='Backup logic')
 parser_backup.add_argument('--src', required=True,help='Openshift / Master vault name')
 parser_backup.add_argument('--dir', required=True,help='Dir for save secrets') 
+parser_backup.add_argument('--include', action='append', help='Only walk paths matching this glob on mount/path ("re:" for a regex), repeatable')
+parser_backup.add_argument('--exclude', action='append', help='Skip paths matching this glob on mount/path ("re:" for a regex), repeatable')
+parser_backup.add_argument('--incremental', action='store_true', help='Store secrets once by content hash under <dir>/<src>.incremental and write a manifest per run')
+parser_backup.add_argument('--keep', type=int, help='Incremental: keep only the newest N manifests and remove unreferenced objects')
+parser_backup.add_argument('--gc', action='store_true', help='Only remove objects no manifest references (with --keep, prune manifests first)')
+parser_backup.add_argument('--workers', type=int, default=8, help='Incremental / archive: concurrent Vault requests')
+parser_backup.add_argument('--archive', action='store_true', help='Write one compressed archive <dir>/<src>-<time>.vbak instead of the directory layout')
+parser_backup.add_argument('--encrypt-key-file', help='Archive: encrypt chunks with AES-256-GCM using the 32 byte key in this file (hex or base64)')
+parser_backup.add_argument('--processes', type=int, help='Archive: compression / encryption processes (default: all cores)')
+parser_backup.add_argument('--compress-level', type=int, default=6, help='Archive: zlib level 1-9')
+parser_backup.add_argument('--chunk-secrets', type=int, default=256, help='Archive: secrets per compressed chunk')
+parser_backup.add_argument('--from-archive', help='Unpack this archive into the directory layout under --dir instead of reading Vault')
+parser_backup.add_argument('--from-manifest', nargs='?', const='latest', help='Restore an incremental manifest (the newest, or this name) from <dir>/<src>.incremental into the directory layout under --dir')
 parser_backup.set_defaults(func=handle_backup)
 parser_sync = subparsers.add_parser('sync', help='Sync logic')
 parser_sync.add_argument('--vault', dest="src",required=True,help='')
+parser_sync.add_argument('--dry-run', action='store_true', help='Only print the de-duplicated sync plan and its API call estimate')
+parser_sync.add_argument('--follow', action='store_true', help='Keep running and replicate only changed secrets')
+parser_sync.add_argument('--propagate-deletes', action='store_true', help='With --follow, delete secrets on the destination when they disappear from the source')
+parser_sync.add_argument('--interval', type=float, default=30.0, help='Initial poll interval per subtree in seconds')
+parser_sync.add_argument('--min-interval', type=float, default=5.0, help='Poll interval for subtrees that keep changing')
+parser_sync.add_argument('--max-interval', type=float, default=300.0, help='Poll interval for subtrees that never change')
+parser_sync.add_argument('--metrics-file', help='Write Prometheus text metrics to this file after every poll')
+parser_sync.add_argument('--resume', action='store_true', help='Continue the last journaled run with its pending items, without walking the sources again')
+parser_sync.add_argument('--retry-failed', action='store_true', help='Re-run the failed items of the last journaled run (and its pending ones)')
+parser_sync.add_argument('--journal', help='Sync journal database (default .vault_cache/sync-<vault>.journal.sqlite)')
+parser_sync.add_argument('--mirror-max-fraction', type=float, help='Mirror jobs: refuse to remove more than this fraction of a destination folder (overrides mirror_max_fraction, default 0.1)')
+parser_sync.add_argument('--mirror-workers', type=int, default=8, help='Mirror jobs: concurrent deletes')
+parser_sync.add_argument('--mirror-rate', type=float, default=0, help='Mirror jobs: max deletes per second (0 = unlimited)')
 parser_sync.set_defaults(func=handle_sync)
 parser_list = subparsers.add_parser('list', help='List on screen secrets')
 parser_list.add_argument('--src',required=True,help='Openshift / Master vault name')
 parser_list.add_argument('--cluster', help='Specify a cluster e.g: [ocp4]')
 parser_list.add_argument('--inline', help='')
 parser_list.add_argument('--dir',help='Destination for secrets')
+parser_list.add_argument('--include', action='append', help='Only walk paths matching this glob on mount/path ("re:" for a regex), repeatable')
+parser_list.add_argument('--exclude', action='append', help='Skip paths matching this glob on mount/path ("re:" for a regex), repeatable')
 parser_list.set_defaults(func=handle_list)
 parser_import = subparsers.add_parser('import', help='Import Secrets')
 parser_import.add_argument('--vault', dest="src",required=True,help='')
+parser_import.add_argument('--force', action='store_true', help='Ignore the local import manifest and rewrite every secret')
+parser_import.add_argument('--watch', action='store_true', help='Keep running and re-import secrets whose files change')
+parser_import.add_argument('--propagate-deletes', action='store_true', help='With --watch, delete a secret from Vault once all its source files are removed')
+parser_import.add_argument('--debounce', type=float, default=2.0, help='Seconds without changes before a watch batch is written')
+parser_import.add_argument('--poll-interval', type=float, default=10.0, help='Rescan interval when inotify is not available')
 parser_import.set_defaults(func=handle_import)
-args = parser.parse_args()
-args.func(args)
+parser_delete = subparsers.add_parser('delete', help='Delete a secret or a whole folder')
+parser_delete.add_argument('--src', required=True, help='Vault name')
+parser_delete.add_argument('--path', required=True, help='mount/path, a trailing / deletes everything below it')
+parser_delete.add_argument('--dry-run', action='store_true', help='Only print what would be deleted')
+parser_delete.add_argument('--workers', type=int, default=8, help='Concurrent Vault requests')
+parser_delete.add_argument('--rate', type=float, default=0, help='Max operations per second (0 = unlimited)')
+parser_delete.set_defaults(func=handle_delete)
+parser_move = subparsers.add_parser('move', help='Move or rename a secret or a whole folder')
+parser_move.add_argument('--src', required=True, help='Vault name')
+parser_move.add_argument('--from', dest='source', required=True, help='mount/path, a trailing / moves everything below it')
+parser_move.add_argument('--to', dest='destination', required=True, help='Destination mount/path')
+parser_move.add_argument('--dry-run', action='store_true', help='Only print what would be moved')
+parser_move.add_argument('--workers', type=int, default=8, help='Concurrent Vault requests')
+parser_move.add_argument('--rate', type=float, default=0, help='Max operations per second (0 = unlimited)')
+parser_move.set_defaults(func=handle_move)
+parser_catalog = subparsers.add_parser('catalog', help='Snapshot clusters into a local SQLite catalog and query it offline')
+parser_catalog.add_argument('action', choices=['refresh', 'list', 'search', 'changed'], help='refresh snapshots clusters, the others only read the catalog')
+parser_catalog.add_argument('--src', action='append', help='Vault name, repeatable (all catalogued clusters when omitted)')
+parser_catalog.add_argument('--db', default=os.path.join(cache_dir, 'catalog.sqlite'), help='Catalog database file')
+parser_catalog.add_argument('--hashes', action='store_true', help='refresh: also store a SHA-256 of the data of new and changed secrets')
+parser_catalog.add_argument('--include', action='append', help='refresh: only walk paths matching this glob on mount/path ("re:" for a regex), repeatable')
+parser_catalog.add_argument('--exclude', action='append', help='refresh: skip paths matching this glob on mount/path ("re:" for a regex), repeatable')
+parser_catalog.add_argument('--workers', type=int, default=8, help='refresh: concurrent Vault requests')
+parser_catalog.add_argument('--rate', type=float, default=0, help='refresh: max requests per second (0 = unlimited)')
+parser_catalog.add_argument('--prefix', default='', help='list: only paths starting with this mount/path')
+parser_catalog.add_argument('--pattern', help='search: glob on mount/path ("re:" for a regex)')
+parser_catalog.add_argument('--since', help='changed: snapshot id or ISO date, default the last snapshot of each cluster')
+parser_catalog.set_defaults(func=handle_catalog)
+parser_queue = subparsers.add_parser('queue', help='Split import / sync actions into work units and run them on several workers')
+parser_queue.add_argument('action', choices=['plan', 'work', 'report', 'run'], help='plan fills the queue, work claims units until it is drained, run does both with local workers and reports')
+parser_queue.add_argument('--queue', default=os.path.join(cache_dir, 'queue.sqlite'), help='Queue database, shared by coordinator and workers')
+parser_queue.add_argument('--vault', action='append', help='plan: target vault name, repeatable (all clusters when omitted)')
+parser_queue.add_argument('--reset', action='store_true', help='plan: drop the previous run from the queue')
+parser_queue.add_argument('--unit-secrets', type=int, default=100, help='plan: secrets per unit for the direct secrets of a synced folder')
+parser_queue.add_argument('--max-attempts', type=int, default=3, help='plan: attempts per unit before it is reported as failed')
+parser_queue.add_argument('--retry-delay', type=float, default=30.0, help='plan: seconds before the first retry of a failed unit, doubled on each attempt')
+parser_queue.add_argument('--lease', type=float, default=300.0, help='work: seconds a claimed unit stays leased without a renewal')
+parser_queue.add_argument('--poll', type=float, default=2.0, help='work: seconds between claims while other workers hold the remaining units')
+parser_queue.add_argument('--worker-id', help='work: name reported for this worker (default host:pid)')
+parser_queue.add_argument('--workers', type=int, default=4, help='run: local worker processes')
+parser_queue.add_argument('--json', action='store_true', help='report: print the aggregated report as JSON')
+parser_queue.set_defaults(func=handle_queue)
+parser_nodes = subparsers.add_parser('nodes', help='Print cluster names')
+parser_nodes.add_argument('--file', help='Read clusters from this yaml instead of the merged config')
+parser_nodes.set_defaults(func=handle_nodes,load_config=False)
+
+for subparser in subparsers.choices.values():
+	subparser.add_argument('--profile', metavar='PREFIX', help='Sample the run and write PREFIX.wall.folded, PREFIX.cpu.folded and PREFIX.summary.txt')
+	subparser.add_argument('--profile-interval', type=float, default=0.005, help='Seconds between profile samples')
+	subparser.add_argument('--profile-top', type=int, default=25, help='Functions listed in the profile summary')
+	subparser.add_argument('--trace', metavar='FILE', help='Record Vault calls and pipeline stages as Chrome trace-event JSON (Perfetto)')
+	subparser.add_argument('--trace-sample', type=float, default=1.0, help='Fraction of top-level spans recorded with everything below them')
+
+if __name__ == "__main__":
+	args = parser.parse_args()
+	profiler = start_profiler(args.profile_interval) if args.profile else None
+	if args.trace:
+		start_tracer(args.trace, args.trace_sample)
+	try:
+		with trace_span(args.command, "command"):
+			if getattr(args, "load_config", True):
+				with trace_span("config"):
+					merge_structure(main_config_file)
+			args.func(args)
+	finally:
+		if profiler != None:
+			stop_profiler(profiler, args.profile, args.profile_top)
+		if tracer != None:
+			write_trace()